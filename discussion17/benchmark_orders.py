@@ -0,0 +1,302 @@
+'''
+Benchmark of process_order (discussion17_activity1_solution.py) on synthetic orders.
+
+The orders mimic the WASP33 data: n_exp exposures (rows) of n_pix pixels, with a
+blaze-like continuum, a per-exposure throughput, noise and a few cosmic-ray hits.
+The reference is the original row-by-row implementation. With -pool the peak memory
+of pool.map(process_order, ...) is compared with process_orders_shared, each run in a
+fresh interpreter so that the peak memory only covers that run.
+
+    python benchmark_orders.py -n_exp 200 -n_pix 4096 -orders 4
+    python benchmark_orders.py -pool -orders 9
+'''
+import os
+import sys
+import time
+import resource
+import subprocess
+import tempfile
+from multiprocessing import Pool
+import numpy as np
+from scipy.stats import median_abs_deviation
+from discussion17_activity1_solution import (process_order, process_orders_shared, normalize_order, stream_orders,
+                                             process_order_chunked, cached_process_order)
+from order_daemon import BASENAME, start_daemon, request
+
+
+def make_orders(directory, n_orders, n_exp, n_pix, nan_fraction=0.0, seed=0):
+    # writes order files like the real data set and returns their basename
+    rng = np.random.default_rng(seed)
+    basename = os.path.join(directory, 'synthetic_order_')
+    x = np.linspace(-1, 1, n_pix)
+    for order in range(n_orders):
+        blaze = 1e4*(1 - 0.6*x**2)
+        throughput = rng.uniform(0.7, 1.3, (n_exp, 1))
+        data = blaze*throughput*(1 + 0.01*rng.standard_normal((n_exp, n_pix)))
+        hits = rng.random((n_exp, n_pix)) < 1e-3
+        data[hits] *= rng.uniform(1.5, 5, np.count_nonzero(hits))
+        if nan_fraction:
+            data[rng.random((n_exp, n_pix)) < nan_fraction] = np.nan
+        np.save(basename + str(order) + '.npy', data)
+    return basename
+
+
+def process_order_loop(ordernumber, basename):
+    # the original implementation, for comparison
+    data = np.load(basename+str(ordernumber)+'.npy')
+    for i in range(data.shape[0]):
+        data[i] = data[i]/np.nanmedian(data[i])
+    medspec = np.nanmedian(data,axis=0)
+    for i in range(data.shape[0]):
+        data[i] = data[i]/medspec
+    threshold = 6*median_abs_deviation(data.flatten())
+    data[np.abs(data-1)>threshold] = np.nan
+    return data
+
+
+def peak_rss_mb():
+    # VmHWM is reset by exec, unlike ru_maxrss, which a subprocess inherits from its parent on Linux
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])/1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+
+def run_variant(variant, basename, n_orders, out_path, chunk_rows=256):
+    # one run; prints its wall time and the peak resident memory of parent and workers
+    orders = list(range(n_orders))
+    t0 = time.perf_counter()
+    if variant == 'exact':
+        # a single order, in memory
+        result = [process_order(0, basename=basename)]
+        np.save(out_path, result[0])
+    elif variant == 'chunked':
+        result = [process_order_chunked(0, basename=basename, out_path=out_path, chunk_rows=chunk_rows)]
+    elif variant == 'map':
+        with Pool(n_orders) as pool:
+            result = pool.starmap(process_order, [(order, basename) for order in orders])
+    else:
+        result = process_orders_shared(orders, basename=basename, out_path=out_path, processes=n_orders)
+    wall = time.perf_counter() - t0
+    # before the checksum, which reads every page of the cube
+    parent = peak_rss_mb()
+    child = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss/1024
+    checksum = float(np.nansum([np.nansum(r) for r in result]))
+    print(f"{wall} {parent} {child} {checksum}")
+
+
+def slow_disk(basename, out_dir, bandwidth):
+    # load/save functions for stream_orders that take as long as a disk with bandwidth MB/s would
+    def load(order):
+        data = np.load(basename + str(order) + '.npy')
+        time.sleep(data.nbytes/(bandwidth*2**20))
+        return data
+
+    def save(order, data):
+        time.sleep(data.nbytes/(bandwidth*2**20))
+        np.save(os.path.join(out_dir, 'processed_' + str(order) + '.npy'), data)
+    return load, save
+
+
+def run_jobs(cmds, jobs, cwd):
+    # like parallel -j jobs: at most jobs commands running at once
+    running = []
+    for cmd in cmds:
+        if len(running) == jobs:
+            running.pop(0).wait()
+        running.append(subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.DEVNULL))
+    for proc in running:
+        proc.wait()
+
+
+def compare(ref, new):
+    # max relative difference where both are finite, and whether the same pixels are masked
+    finite = np.isfinite(ref) & np.isfinite(new)
+    return np.max(np.abs(new[finite]/ref[finite] - 1)), np.array_equal(np.isnan(ref), np.isnan(new))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark process_order on synthetic WASP33-sized orders")
+    parser.add_argument("-n_exp", type=int, default=200, help="exposures per order")
+    parser.add_argument("-n_pix", type=int, default=4096, help="pixels per exposure")
+    parser.add_argument("-orders", type=int, default=4, help="number of orders")
+    parser.add_argument("-nan_fraction", type=float, default=0.0, help="fraction of NaN pixels in the input")
+    parser.add_argument("-pool", action="store_true", help="compare peak memory of pool.map and process_orders_shared")
+    parser.add_argument("-stream", action="store_true", help="compare a sequential loop with stream_orders on a slow disk")
+    parser.add_argument("-bandwidth", type=float, default=50.0, help="simulated disk bandwidth in MB/s for -stream")
+    parser.add_argument("-processes", type=int, default=2, help="worker processes for -stream")
+    parser.add_argument("-max_in_flight", type=int, default=3, help="orders held in memory at once for -stream")
+    parser.add_argument("-daemon", action="store_true", help="compare one interpreter per order with order_daemon.py")
+    parser.add_argument("-jobs", type=int, default=4, help="concurrent commands for -daemon (parallel -j)")
+    parser.add_argument("-chunked", action="store_true", help="compare process_order with process_order_chunked")
+    parser.add_argument("-chunk_rows", type=int, default=256, help="exposures per chunk for -chunked")
+    parser.add_argument("-cache", action="store_true", help="time cached_process_order cold, warm and after one change")
+    parser.add_argument("-variant", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("-basename", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.basename, args.orders, args.basename + args.variant + '.npy', args.chunk_rows)
+        sys.exit()
+
+    if args.pool:
+        with tempfile.TemporaryDirectory() as tmp:
+            basename = make_orders(tmp, args.orders, args.n_exp, args.n_pix, args.nan_fraction)
+            size = args.orders*args.n_exp*args.n_pix*8/2**20
+            print(f"{args.orders} orders of {args.n_exp}x{args.n_pix}: {size:.0f} MB of data")
+            for variant, label in (('map', 'pool.map, results pickled back'), ('shared', 'shared output cube')):
+                out = subprocess.run([sys.executable, __file__, '-variant', variant, '-basename', basename,
+                                      '-orders', str(args.orders)], capture_output=True, text=True, check=True)
+                wall, parent, child, checksum = map(float, out.stdout.split())
+                print(f"{label:>31s}: {wall:.2f} s, peak RSS parent {parent:.0f} MB, largest worker {child:.0f} MB,"
+                      f" checksum {checksum:.6e}")
+        sys.exit()
+
+    if args.chunked:
+        with tempfile.TemporaryDirectory() as tmp:
+            basename = make_orders(tmp, 1, args.n_exp, args.n_pix, args.nan_fraction)
+            print(f"one order of {args.n_exp}x{args.n_pix}: {args.n_exp*args.n_pix*8/2**20:.0f} MB")
+            for variant, label in (('exact', 'process_order'), ('chunked', f'chunked, {args.chunk_rows} rows')):
+                out = subprocess.run([sys.executable, __file__, '-variant', variant, '-basename', basename,
+                                      '-orders', '1', '-chunk_rows', str(args.chunk_rows)],
+                                     capture_output=True, text=True, check=True)
+                wall, parent, child, checksum = map(float, out.stdout.split())
+                print(f"{label:>22s}: {wall:.2f} s, peak RSS {parent:.0f} MB")
+            exact, approx = np.load(basename + 'exact.npy'), np.load(basename + 'chunked.npy')
+            diff, same_mask = compare(exact, approx)
+            masked_exact, masked_approx = np.count_nonzero(np.isnan(exact)), np.count_nonzero(np.isnan(approx))
+            print(f"max rel diff {diff:.1e}, masked pixels {masked_exact} exact vs {masked_approx} chunked,"
+                  f" same mask: {same_mask}")
+        sys.exit()
+
+    if args.cache:
+        with tempfile.TemporaryDirectory() as tmp:
+            basename = make_orders(tmp, args.orders, args.n_exp, args.n_pix, args.nan_fraction)
+            cache_dir = os.path.join(tmp, 'cache')
+            orders = range(args.orders)
+
+            def run(label, **kwargs):
+                t0 = time.perf_counter()
+                result = [cached_process_order(order, basename=basename, cache_dir=cache_dir, **kwargs) for order in orders]
+                # touch every page, as an analysis would
+                checksum = sum(float(np.nansum(r)) for r in result)
+                print(f"{label:>27s}: {time.perf_counter() - t0:.3f} s")
+                return result
+
+            print(f"{args.orders} orders of {args.n_exp}x{args.n_pix}")
+            cold = run("cold cache")
+            warm = run("warm cache")
+            same = all(np.array_equal(w, process_order(order, basename=basename), equal_nan=True)
+                       for order, w in zip(orders, warm))
+            # a new reduction of one order
+            data = np.load(basename + '0.npy')
+            np.save(basename + '0.npy', data*1.001)
+            changed = run("one order changed")
+            run("threshold_factor 5", threshold_factor=5)
+            n_files = len([name for name in os.listdir(cache_dir) if name.endswith('.npy')])
+            print(f"hits identical to process_order: {same}, {n_files} results cached")
+            one = cold[0].nbytes
+            # eviction happens when results are added
+            run("factor 4, max_bytes 3 orders", threshold_factor=4, max_bytes=3*one + one//2)
+            n_files = len([name for name in os.listdir(cache_dir) if name.endswith('.npy')])
+            print(f"after LRU eviction: {n_files} results cached")
+        sys.exit()
+
+    if args.stream:
+        with tempfile.TemporaryDirectory() as tmp:
+            basename = make_orders(tmp, args.orders, args.n_exp, args.n_pix, args.nan_fraction)
+            orders = list(range(args.orders))
+            seq_dir, stream_dir = os.path.join(tmp, 'sequential'), os.path.join(tmp, 'stream')
+            os.makedirs(seq_dir)
+            os.makedirs(stream_dir)
+            t_io = args.n_exp*args.n_pix*8/(args.bandwidth*2**20)
+            print(f"{args.orders} orders of {args.n_exp}x{args.n_pix}, {args.bandwidth:g} MB/s disk:"
+                  f" {t_io:.2f} s to read and again to write each order")
+
+            load, save = slow_disk(basename, seq_dir, args.bandwidth)
+            t0 = time.perf_counter()
+            for order in orders:
+                save(order, normalize_order(load(order)))
+            t_seq = time.perf_counter() - t0
+            print(f"sequential load/process/save: {t_seq:.2f} s")
+
+            load, save = slow_disk(basename, stream_dir, args.bandwidth)
+            t0 = time.perf_counter()
+            stream_orders(orders, processes=args.processes, max_in_flight=args.max_in_flight, load=load, save=save)
+            t_stream = time.perf_counter() - t0
+            same = all(np.array_equal(np.load(os.path.join(seq_dir, f'processed_{order}.npy')),
+                                      np.load(os.path.join(stream_dir, f'processed_{order}.npy')), equal_nan=True)
+                       for order in orders)
+            print(f"stream_orders ({args.processes} processes, {args.max_in_flight} in flight): {t_stream:.2f} s,"
+                  f" speedup {t_seq/t_stream:.2f}x,"
+                  f" identical output: {same}")
+        sys.exit()
+
+    if args.daemon:
+        here = os.path.dirname(os.path.abspath(__file__))
+        with tempfile.TemporaryDirectory() as tmp:
+            basename = make_orders(tmp, args.orders, args.n_exp, args.n_pix, args.nan_fraction)
+            # the single-order mode of the solution script reads the WASP33 file names from the working directory
+            for order in range(args.orders):
+                os.symlink(basename + f'{order}.npy', os.path.join(tmp, BASENAME + f'{order}.npy'))
+            print(f"{args.orders} orders of {args.n_exp}x{args.n_pix}, {args.jobs} at a time")
+
+            t0 = time.perf_counter()
+            run_jobs([[sys.executable, os.path.join(here, 'discussion17_activity1_solution.py'), str(order)]
+                      for order in range(args.orders)], args.jobs, tmp)
+            t_interp = time.perf_counter() - t0
+            print(f"one interpreter per order: {t_interp:.2f} s ({t_interp/args.orders*1e3:.0f} ms per order)")
+
+            socket_path = os.path.join(tmp, 'daemon.sock')
+            t0 = time.perf_counter()
+            daemon = start_daemon(socket_path, processes=args.jobs, cwd=tmp)
+            t_start = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            run_jobs([[sys.executable, os.path.join(here, 'order_daemon.py'), '-socket', socket_path, str(order)]
+                      for order in range(args.orders)], args.jobs, tmp)
+            t_daemon = time.perf_counter() - t0
+            request({'stop': True}, path=socket_path)
+            daemon.wait()
+            same = all(np.array_equal(np.load(os.path.join(tmp, 'output', f'WASP33_nov21_processed_order{order}.npy')),
+                                      process_order(order, basename=basename), equal_nan=True)
+                       for order in range(args.orders))
+            print(f"daemon + thin clients: {t_daemon:.2f} s ({t_daemon/args.orders*1e3:.0f} ms per order,"
+                  f" daemon start {t_start:.2f} s once), speedup {t_interp/t_daemon:.1f}x, correct output: {same}")
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        basename = make_orders(tmp, args.orders, args.n_exp, args.n_pix, args.nan_fraction)
+        orders = range(args.orders)
+
+        t0 = time.perf_counter()
+        ref = [process_order_loop(order, basename) for order in orders]
+        t_loop = (time.perf_counter() - t0)/args.orders
+        print(f"row loops:  {t_loop*1e3:8.1f} ms per {args.n_exp}x{args.n_pix} order")
+
+        for dtype in (None, np.float32):
+            t0 = time.perf_counter()
+            new = [process_order(order, basename=basename, dtype=dtype) for order in orders]
+            t_new = (time.perf_counter() - t0)/args.orders
+            diffs = [compare(r, n) for r, n in zip(ref, new)]
+            print(f"vectorized ({np.dtype(dtype or np.float64).name}): {t_new*1e3:8.1f} ms per order,"
+                  f" speedup {t_loop/t_new:.1f}x, max rel diff {max(d[0] for d in diffs):.1e},"
+                  f" same mask: {all(d[1] for d in diffs)}")
+
+        # a single-exposure order takes the one-row paths of median and nanmedian
+        os.makedirs(os.path.join(tmp, 'single'))
+        single = make_orders(os.path.join(tmp, 'single'), 1, 1, args.n_pix, args.nan_fraction)
+        diff, same_mask = compare(process_order_loop(0, single), process_order(0, basename=single))
+        print(f"one exposure: max rel diff {diff:.1e}, same mask: {same_mask}")
+        # infinite pixels: the MAD threshold stays finite and they are masked
+        data = np.load(basename + '0.npy')
+        data[0, 0], data[-1, -1] = np.inf, -np.inf
+        np.save(basename + '0.npy', data)
+        for low_memory in (False, True):
+            diff, same_mask = compare(process_order_loop(0, basename), process_order(0, basename=basename, low_memory=low_memory))
+            print(f"infinite pixels (low_memory={low_memory}): max rel diff {diff:.1e}, same mask: {same_mask}")
@@ -1,31 +1,141 @@
 import argparse
-import numpy as np
-import matplotlib.pyplot as plt
+
+# numpy and matplotlib are imported only once they are needed, so -h and runs
+# that do not plot start without paying for the matplotlib import.
+#
+# Batch mode: many temperatures in one run, e.g.
+#   python demo3_argparse.py 3000 5800 10000 -spectra spectra.npz
+#   python demo3_argparse.py -tfile temps.txt -spectra spectra.npz -save True -outfile panels.png
+# All spectra are computed as one 2D array (temperatures x wavelengths), and already
+# computed spectra are reused from the cache directory (keyed by T and the wavelength grid),
+# which holds one append-only segment file per run that computed new spectra.
 
 # ---- Argument Parser Setup ----
 parser = argparse.ArgumentParser(description="Plot Blackbody Spectrum from Temperature")
-parser.add_argument("temperature", type=float, help="Temperature in Kelvin")
+parser.add_argument("temperature", type=float, nargs="*", help="Temperature(s) in Kelvin")
+parser.add_argument("-tfile", type=str, default=None, help="Text file with more temperatures (whitespace separated)")
 parser.add_argument("-save", type=bool, help="Save the plot")
 parser.add_argument("-outfile", type=str, default="blackbody.png", help="Output filename for the plot")
+parser.add_argument("-spectra", type=str, default=None, help="Write all spectra to this .npz file (batch mode)")
+parser.add_argument("-per_page", type=int, default=16, help="Panels per saved figure in batch mode")
+parser.add_argument("-cache", type=str, default=".blackbody_cache", help="Cache directory ('' disables the cache)")
 
 
 # ---- Parse Arguments ----
 args = parser.parse_args()
-print(f"Temperature: {args.temperature} K")
+
+import os
+import time
+import hashlib
+import numpy as np
+
+temperatures = list(args.temperature)
+if args.tfile:
+    temperatures += list(np.atleast_1d(np.loadtxt(args.tfile, dtype=float)))
+if not temperatures:
+    parser.error("give at least one temperature or -tfile")
+print(f"Temperature: {temperatures[0]} K" if len(temperatures) == 1 else f"Temperatures: {len(temperatures)} values")
+
+# Define Constants
+h = 6.626e-34  # Planck's constant (J*s)
+c = 3.0e8      # Speed of light (m/s)
+k = 1.381e-23  # Boltzmann's constant (J/K)
+
+# Define wavelength range
+wavelength = np.linspace(1e-9, 3e-6, 1000)  # 1 nm to 3000 nm
+
+
+# ---- Spectra for many temperatures at once ----
+def planck_spectra(temperatures, wavelength):
+    # Planck's Law on a (temperatures, wavelengths) grid in one broadcast
+    T = np.asarray(temperatures, dtype=float)[:, None]
+    with np.errstate(over='ignore'):
+        return (2.0*h*c**2) / (wavelength**5) / (np.exp((h*c) / (wavelength*k*T)) - 1.0)
+
+# the cache keeps at most this many segment files and spectra per grid; the oldest segments go first
+CACHE_SEGMENTS = 256
+CACHE_SPECTRA = 100000
+
+def cached_spectra(temperatures, wavelength, cache_dir):
+    """
+    Spectra for the given temperatures, reusing the ones stored in cache_dir for the same grid.
+
+    Every run that computes new spectra adds one segment file: a .npy array whose rows are
+    (T, spectrum), written to a temporary name and renamed, so T and I can never get out of step
+    and a miss costs only the new rows. Segments are never modified; beyond CACHE_SEGMENTS files
+    or CACHE_SPECTRA spectra the oldest ones are deleted.
+    """
+    T = np.asarray(temperatures, dtype=float)
+    if not cache_dir:
+        return planck_spectra(T, wavelength)
+    key = hashlib.sha1(np.ascontiguousarray(wavelength).tobytes()).hexdigest()[:16]
+    grid_dir = os.path.join(cache_dir, f"grid_{key}")
+    segments = []
+    if os.path.isdir(grid_dir):
+        for name in sorted(os.listdir(grid_dir)):
+            if name.startswith("seg_") and name.endswith(".npy"):
+                try:
+                    seg = np.load(os.path.join(grid_dir, name), mmap_mode='r')
+                except (FileNotFoundError, ValueError):
+                    continue  # removed by a concurrent run
+                if seg.ndim == 2 and seg.shape[1] == wavelength.size + 1:
+                    segments.append(seg)
+
+    # one sorted array of all cached temperatures, so every lookup is a binary search
+    out = np.empty((T.size, wavelength.size))
+    hit = np.zeros(T.size, bool)
+    if segments:
+        cached_T = np.concatenate([np.array(seg[:, 0]) for seg in segments])
+        where = np.concatenate([np.column_stack((np.full(len(seg), i), np.arange(len(seg))))
+                                for i, seg in enumerate(segments)])
+        order = np.argsort(cached_T, kind='stable')
+        cached_T, where = cached_T[order], where[order]
+        idx = np.minimum(np.searchsorted(cached_T, T), cached_T.size - 1)
+        hit = cached_T[idx] == T
+        for i, seg in enumerate(segments):
+            take = hit & (where[idx, 0] == i)
+            if take.any():
+                out[take] = seg[where[idx[take], 1], 1:]
+    missing = np.unique(T[~hit])
+    if missing.size:
+        new_I = planck_spectra(missing, wavelength)
+        out[~hit] = new_I[np.searchsorted(missing, T[~hit])]
+        os.makedirs(grid_dir, exist_ok=True)
+        # zero-padded time first, so sorted names are oldest first
+        name = f"seg_{time.time_ns():020d}_{os.getpid()}.npy"
+        tmp = os.path.join(grid_dir, f"tmp_{name}")
+        np.save(tmp, np.column_stack((missing, new_I)))
+        os.replace(tmp, os.path.join(grid_dir, name))
+        _trim_cache(grid_dir)
+    print(f"{np.count_nonzero(hit)} of {T.size} spectra from the cache")
+    return out
+
+def _trim_cache(grid_dir):
+    # deletes the oldest segments beyond CACHE_SEGMENTS files or CACHE_SPECTRA spectra
+    names = sorted(n for n in os.listdir(grid_dir) if n.startswith("seg_") and n.endswith(".npy"))
+    counts = []
+    for name in names:
+        try:
+            counts.append(len(np.load(os.path.join(grid_dir, name), mmap_mode='r')))
+        except (FileNotFoundError, ValueError):
+            counts.append(0)
+    total = sum(counts)
+    for i, name in enumerate(names[:-1]):  # always keep the newest segment
+        if len(names) - i <= CACHE_SEGMENTS and total <= CACHE_SPECTRA:
+            break
+        try:
+            os.remove(os.path.join(grid_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= counts[i]
+
 
 # ---- Define Plotting Function ----
 def plot_blackbody_spectrum(temperature, save=False, outfile=args.outfile):
-    
-    # Define Constants
-    h = 6.626e-34  # Planck's constant (J*s)
-    c = 3.0e8      # Speed of light (m/s)
-    k = 1.381e-23  # Boltzmann's constant (J/K)
-
-    # Define wavelength range 
-    wavelength = np.linspace(1e-9, 3e-6, 1000)  # 1 nm to 3000 nm
+    import matplotlib.pyplot as plt
 
     # Planck's Law
-    intensity = (2.0*h*c**2) / (wavelength**5) / (np.exp((h*c) / (wavelength*k*temperature)) - 1.0)
+    intensity = planck_spectra([temperature], wavelength)[0]
 
     # Plotting
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -42,9 +152,45 @@ def plot_blackbody_spectrum(temperature, save=False, outfile=args.outfile):
 
     plt.show()
 
-# ---- Generate Plot ----
-plot_blackbody_spectrum(args.temperature, 
-                        save=args.save,
-                        outfile=args.outfile)
+def plot_panels(temperatures, wavelength, intensity, outfile, per_page=16):
+    # multi-panel pages rendered off-screen; outfile, or outfile_p1.png, outfile_p2.png, ... for several pages
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    root, ext = os.path.splitext(outfile)
+    pages = range(0, len(temperatures), per_page)
+    for page, start in enumerate(pages):
+        n = min(per_page, len(temperatures) - start)
+        ncols = int(np.ceil(np.sqrt(n)))
+        nrows = int(np.ceil(n/ncols))
+        fig, axs = plt.subplots(nrows, ncols, figsize=(4*ncols, 3*nrows), squeeze=False)
+        for ax, T, I in zip(axs.flat, temperatures[start:start+n], intensity[start:start+n]):
+            ax.plot(wavelength * 1e9, I)
+            ax.set_title(f'T = {T} K')
+            ax.grid()
+        for ax in axs.flat[n:]:
+            ax.axis('off')
+        fig.supxlabel('Wavelength [nm]')
+        fig.supylabel('Intensity [W/m²/nm]')
+        fig.tight_layout()
+        name = outfile if len(pages) == 1 else f"{root}_p{page+1}{ext}"
+        fig.savefig(name)
+        plt.close(fig)
+        print(f"Plot saved as {name}")
 
-    
+
+# ---- Generate Plot ----
+if len(temperatures) == 1 and args.spectra is None:
+    plot_blackbody_spectrum(temperatures[0],
+                            save=args.save,
+                            outfile=args.outfile)
+else:
+    intensity = cached_spectra(temperatures, wavelength, args.cache)
+    if args.spectra:
+        np.savez(args.spectra, temperature=np.asarray(temperatures), wavelength=wavelength, intensity=intensity)
+        print(f"Spectra saved as {args.spectra}")
+    if not args.spectra and not args.save:
+        print(f"Peak wavelengths [nm]: {wavelength[np.argmax(intensity, axis=1)] * 1e9}")
+    if args.save:
+        plot_panels(temperatures, wavelength, intensity, args.outfile, per_page=args.per_page)
@@ -1,61 +1,583 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import median_abs_deviation
 from multiprocessing import Pool
 from datetime import datetime
 import logging
 import os
+import hashlib
+import json
 import subprocess
 import sys
 
-def process_order(ordernumber, basename='WASP33_nov21_rereduced_fluxes_coadded_order_',plot=False):
-    data = np.load(basename+str(ordernumber)+'.npy')
+def median(data, axis=None, overwrite_input=False, chunk=2**18):
+    # np.median partitions at two positions plus -1 (to find NaNs), which is several times slower
+    # than one partition at n//2 followed by the max of the lower half; NaNs must be handled by the caller.
+    # Without overwrite_input the slices are partitioned a block at a time, copying about chunk values.
+    if axis is None:
+        data = data.ravel()
+        axis = 0
+    data = np.moveaxis(data, axis, -1)
+    n = data.shape[-1]
+    if overwrite_input:
+        data.partition(n//2, axis=-1)
+        return _middle(data, n)
+    lead = data.shape[:-1]
+    data = data.reshape(-1, n)  # a view for 1D and 2D data
+    if data.shape[0] == 1:
+        return np.reshape(_middle(np.partition(data[0], n//2), n), lead)[()]
+    out = np.empty(data.shape[0], dtype=np.result_type(data.dtype, np.float16))
+    step = max(1, chunk//max(n, 1))
+    for start in range(0, data.shape[0], step):
+        out[start:start+step] = _middle(np.partition(data[start:start+step], n//2, axis=-1), n)
+    return out.reshape(lead)[()]
+
+def _middle(part, n):
+    # median of slices partitioned at n//2
+    upper = part[..., n//2]
+    if n % 2:
+        return upper
+    return (part[..., :n//2].max(axis=-1) + upper)/2
+
+def nanmedian(data, axis=None, chunk=2**18):
+    # np.nanmedian along an axis loops over the rows in Python; without NaNs the plain median is the same
+    nans = np.isnan(data)
+    if not nans.any():
+        return median(data, axis=axis)
+    if axis is None:
+        n = data.size - np.count_nonzero(nans)
+        if n == 0:
+            return np.nan
+        return np.mean(select(data, [(n - 1)//2, n//2], chunk=chunk))
+    # sorting puts the NaNs last, so the median of each slice sits in the middle of its first n entries;
+    # the slices are sorted a block at a time, so the sorted copy never exceeds about chunk values
+    data, nans = np.moveaxis(data, axis, -1), np.moveaxis(nans, axis, -1)
+    lead, n_axis = data.shape[:-1], data.shape[-1]
+    data, nans = data.reshape(-1, n_axis), nans.reshape(-1, n_axis)  # views for 2D data
+    out = np.empty(data.shape[0], dtype=np.result_type(data.dtype, np.float16))
+    step = max(1, chunk//max(n_axis, 1))
+    for start in range(0, data.shape[0], step):
+        ordered = np.sort(data[start:start+step], axis=-1)
+        n = np.count_nonzero(~nans[start:start+step], axis=-1)[:, None]
+        lower = np.take_along_axis(ordered, np.maximum((n - 1)//2, 0), -1)
+        upper = np.take_along_axis(ordered, n//2, -1)
+        out[start:start+step] = ((lower + upper)/2)[:, 0]  # all-NaN slices give NaN
+    return out.reshape(lead)[()]
+
+def select(data, ks, center=None, chunk=2**18):
+    """
+    Exact k-th smallest values (0-based ranks ks) of data, or of |data - center|, without a copy of data.
+
+    The data is read chunk values at a time. Each pass counts the candidates in 4096 equal bins
+    of their range and keeps only the bin holding the rank, until the candidates fit in one
+    chunk; those are then gathered and partitioned. Ranks that share a bin (like the two middle
+    ranks of a median) share the passes. NaNs are ignored; infinite values are counted but kept
+    out of the bins, so they only shift the ranks.
+
+    Returns:
+        ndarray: the value at every rank in ks.
+    """
+    flat = data.reshape(-1)  # a view for contiguous data
+
+    def chunks():
+        for start in range(0, flat.size, chunk):
+            values = flat[start:start+chunk]
+            yield values if center is None else np.abs(values - center)
+
+    lo, hi = np.inf, -np.inf
+    n_low = n_high = n_finite = 0
+    for values in chunks():
+        n_low += np.count_nonzero(values == -np.inf)
+        n_high += np.count_nonzero(values == np.inf)
+        finite = values[np.isfinite(values)] if n_low or n_high else values
+        n_finite += np.count_nonzero(~np.isnan(finite))
+        lo, hi = min(lo, np.nanmin(finite, initial=np.inf)), max(hi, np.nanmax(finite, initial=-np.inf))
+    ks = np.asarray(ks)
+    # ranks below n_low are -inf and ranks past the finite values are inf; the rest are binned
+    inside = ks[(ks >= n_low) & (ks < n_low + n_finite)] - n_low
+    found = _select_ranks(chunks, inside, lo, hi, chunk, everything=not (n_low or n_high)) if inside.size else {}
+    return np.array([-np.inf if k < n_low else found[k - n_low] if k < n_low + n_finite else np.inf for k in ks])
+
+def _select_ranks(chunks, ks, lo, hi, chunk, bins=4096, everything=False):
+    # {k: value of rank k among the values lo <= v <= hi} (ranks counted from the values < lo);
+    # everything: no value lies outside [lo, hi], so the NaN-free chunks need no mask
+    if lo == hi:
+        return {k: lo for k in ks}
+    halve = not np.isfinite(hi - lo)  # a range wider than the largest float
+    scale = bins/(hi/2 - lo/2) if halve else bins/(hi - lo)
+
+    def binned(values):
+        # candidates and their bin; floor((v - lo)*scale) is monotone in v, so every bin is an interval
+        if not (everything and not np.isnan(values).any()):
+            values = values[(values >= lo) & (values <= hi)]
+        t = np.subtract(values/2, lo/2) if halve else np.subtract(values, lo)
+        t *= scale
+        j = t.astype(np.intp)
+        np.minimum(j, bins - 1, out=j)
+        return values, j
+
+    counts = np.zeros(bins, dtype=np.int64)
+    for values in chunks():
+        counts += np.bincount(binned(values)[1], minlength=bins)
+    cum = np.cumsum(counts)
+    where = np.searchsorted(cum, ks, side='right')
+    found = {}
+    for b in np.unique(where):
+        group = ks[where == b]
+        below = cum[b - 1] if b > 0 else 0
+        if counts[b] <= chunk:
+            members = np.concatenate([values[j == b] for values, j in map(binned, chunks())])
+            part = np.partition(members, group - below)
+            found.update({k: part[k - below] for k in group})
+        else:
+            # the bin as an exact interval of values, split again
+            b_lo, b_hi = np.inf, -np.inf
+            for values, j in map(binned, chunks()):
+                members = values[j == b]
+                if members.size:
+                    b_lo, b_hi = min(b_lo, members.min()), max(b_hi, members.max())
+            deeper = _select_ranks(chunks, group - below, b_lo, b_hi, chunk, bins)
+            found.update({k: deeper[k - below] for k in group})
+    return found
+
+def process_order(ordernumber, basename='WASP33_nov21_rereduced_fluxes_coadded_order_',plot=False,dtype=None,out=None,
+                  threshold_factor=6, low_memory=False):
+    # the file is memory-mapped and copied once, straight into out if given (e.g. a slice of a shared output cube)
+    source = np.load(basename+str(ordernumber)+'.npy', mmap_mode='r')
+    if out is None:
+        # dtype e.g. np.float32: half the memory traffic, ~1e-7 relative precision
+        out = np.empty(source.shape, dtype=source.dtype if dtype is None else dtype)
+    out[...] = source
+    data = out
+    del source
     logging.info('Loaded file: ' + basename+str(ordernumber)+'.npy')
+    normalize_order(data, plot=plot, threshold_factor=threshold_factor, low_memory=low_memory)
+    logging.info('Done with ' + basename+str(ordernumber)+'.npy')
+    return data
+
+def normalize_order(data, plot=False, threshold_factor=6, low_memory=False):
+    # normalization and outlier masking of one order, in place; outliers are more than
+    # threshold_factor times the MAD away from 1
     if plot:
+        # only imported when plotting: matplotlib doubles the import time of this module
+        import matplotlib.pyplot as plt
         plt.imshow(data,aspect=15,vmin=0,vmax=1e4)
         plt.show()
-    ### Scale each exposure to a consistent median
-    for i in range(data.shape[0]):
-        data[i] = data[i]/np.nanmedian(data[i])
+    ### Scale each exposure to a consistent median (one median per row, broadcast over the columns)
+    data /= nanmedian(data, axis=1)[:, None]
     ### Now we want to make the median over the time series (y-axis)
-    medspec = np.nanmedian(data,axis=0)
+    medspec = nanmedian(data, axis=0)
     ### Now devide each spectrum in the time series by its median
-    for i in range(data.shape[0]):
-        data[i] = data[i]/medspec
+    data /= medspec
     ### And let's mask outliers. Use a boolean index for speed
-    threshold = 6*median_abs_deviation(data.flatten())
-    data[np.abs(data-1)>threshold] = np.nan	
+    # 6*median_abs_deviation(data.flatten()) with one flattened copy instead of its several temporaries,
+    # and |data - 1| only formed for a block of rows at a time. low_memory: both medians are exact
+    # selections that read the order in chunks (select), with no copy but about 1.5x slower. Like
+    # median_abs_deviation, a NaN anywhere would make the threshold NaN, in which case nothing is masked.
+    if not np.isnan(data).any():
+        n = data.size
+        ranks = [(n - 1)//2, n//2]
+        if low_memory:
+            center = np.mean(select(data, ranks))
+            mad = np.mean(select(data, ranks, center=center))
+        else:
+            values = np.partition(data, ranks, axis=None)
+            center = np.mean(values[ranks])
+            values -= center
+            np.abs(values, out=values)
+            values.partition(ranks)
+            mad = np.mean(values[ranks])
+            del values
+        threshold = threshold_factor*mad
+        step = max(1, 2**18//max(data[0].size, 1))
+        for start in range(0, data.shape[0], step):
+            block = data[start:start+step]
+            block[np.abs(block - 1) > threshold] = np.nan
 
     if plot:
         plt.imshow(data,aspect=15,vmin=0.95,vmax=1.05)
         plt.show()
-    logging.info('Done with ' + basename+str(ordernumber)+'.npy')
     return data
 
+def process_order_chunked(ordernumber, basename='WASP33_nov21_rereduced_fluxes_coadded_order_', out_path=None,
+                          chunk_rows=256, k=400, seed=0, dtype=None, threshold_factor=6):
+    """
+    Out-of-core process_order for orders larger than the memory: only chunk_rows exposures are in memory at a time.
+
+    The per-exposure medians are exact (one row at a time). The median spectrum (one median per column)
+    and the median and MAD of the outlier threshold come from QuantileSketch (quantile_sketch.py): each
+    is within a rank error of about 1/k of the exact one (rank_error() of the sketches, logged here,
+    bounds it with probability 1 - 1e-3). The sketches take about 2 k n_pix values of memory,
+    independent of the number of exposures. The input is read once, then the output file is
+    passed over three more times, chunk by chunk.
+
+    Args:
+        out_path (str): output .npy file, default output/WASP33_nov21_processed_order<N>.npy.
+        chunk_rows (int): exposures per chunk, which sets the peak memory.
+        k (int): sketch capacity; higher is more accurate and uses more memory.
+
+    Returns:
+        ndarray: the processed order, memory-mapped from out_path.
+    """
+    from quantile_sketch import QuantileSketch
+    in_path = basename+str(ordernumber)+'.npy'
+    source = np.load(in_path, mmap_mode='r')
+    shape, in_dtype = source.shape, source.dtype
+    del source  # only for the header; the rows are read with plain file I/O so they do not stay mapped
+    dtype = in_dtype if dtype is None else np.dtype(dtype)
+    if out_path is None:
+        out_path = 'output/WASP33_nov21_processed_order'+str(ordernumber)+'.npy'
+    if os.path.dirname(out_path):
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    out = np.lib.format.open_memmap(out_path, mode='w+', dtype=dtype, shape=shape)
+    del out  # writes the header
+    chunks = [(start, min(start+chunk_rows, shape[0])) for start in range(0, shape[0], chunk_rows)]
+    logging.info('Chunked processing of ' + in_path + ' in ' + str(len(chunks)) + ' chunks')
+
+    with _RowFile(in_path, 'rb') as source, _RowFile(out_path, 'r+b') as out:
+        ### Exact per-exposure medians; the normalized rows feed one sketch per column
+        columns = QuantileSketch(k=k, shape=shape[1:], seed=seed)
+        for start, stop in chunks:
+            block = source.read(start, stop).astype(dtype)
+            block /= nanmedian(block, axis=1)[:, None]
+            columns.update(block)
+            out.write(start, block)
+        medspec = columns.quantile(0.5)
+
+        ### Divide by the median spectrum; the sketch of all pixels gives the center for the MAD
+        pixels = QuantileSketch(k=k, seed=seed+1)
+        has_nan = False
+        for start, stop in chunks:
+            block = out.read(start, stop)
+            block /= medspec
+            out.write(start, block)
+            has_nan = has_nan or np.isnan(block).any()
+            pixels.update(block.ravel())
+
+        ### Mask the outliers (as in normalize_order, not if there is a NaN anywhere)
+        if not has_nan:
+            center = pixels.quantile(0.5)
+            deviations = QuantileSketch(k=k, seed=seed+2)
+            for start, stop in chunks:
+                deviations.update(np.abs(out.read(start, stop) - center).ravel())
+            threshold = threshold_factor*deviations.quantile(0.5)
+            for start, stop in chunks:
+                block = out.read(start, stop)
+                block[np.abs(block - 1) > threshold] = np.nan
+                out.write(start, block)
+            logging.info('Rank error bounds: median spectrum ' + f'{columns.rank_error():.2e}' + ', center '
+                         + f'{pixels.rank_error():.2e}' + ', MAD ' + f'{deviations.rank_error():.2e}')
+    logging.info('Done with ' + in_path)
+    return np.load(out_path, mmap_mode='r')
+
+class _RowFile:
+    # rows start:stop of a C-ordered .npy file, read and written with plain file I/O
+    def __init__(self, path, mode):
+        self.file = open(path, mode)
+        version = np.lib.format.read_magic(self.file)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, self.dtype = read_header(self.file)
+        if fortran_order:
+            raise ValueError(path + ' is stored in Fortran order')
+        self.offset = self.file.tell()
+        self.row_shape = shape[1:]
+        self.row_size = int(np.prod(self.row_shape))
+
+    def read(self, start, stop):
+        self.file.seek(self.offset + start*self.row_size*self.dtype.itemsize)
+        data = np.fromfile(self.file, dtype=self.dtype, count=(stop - start)*self.row_size)
+        return data.reshape((stop - start,) + self.row_shape)
+
+    def write(self, start, block):
+        self.file.seek(self.offset + start*self.row_size*self.dtype.itemsize)
+        np.ascontiguousarray(block, dtype=self.dtype).tofile(self.file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+def _process_into_cube(job):
+    # Pool worker: processes one order into its slice of the output cube and only returns the order number
+    index, ordernumber, basename, out_path = job
+    cube = np.load(out_path, mmap_mode='r+')
+    process_order(ordernumber, basename=basename, out=cube[index])
+    cube.flush()
+    return ordernumber
+
+def process_orders_shared(orders, basename='WASP33_nov21_rereduced_fluxes_coadded_order_',
+                          out_path='output/WASP33_nov21_processed_orders.npy', processes=None, dtype=None):
+    """
+    Processes all orders with a Pool into one memory-mapped cube of shape (n_orders, n_exp, n_pix).
+
+    pool.map(process_order, orders) pickles every processed order back to the parent, so the parent
+    ends up holding a second copy of all the data. Here the workers write into the cube file instead
+    and return only their order number; the parent gets the cube back memory-mapped.
+    All orders must have the same shape.
+    """
+    headers = [np.load(basename+str(order)+'.npy', mmap_mode='r') for order in orders]
+    shape = headers[0].shape
+    if any(h.shape != shape for h in headers):
+        raise ValueError('process_orders_shared needs orders of equal shape')
+    dtype = headers[0].dtype if dtype is None else dtype
+    del headers
+    if os.path.dirname(out_path):
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    cube = np.lib.format.open_memmap(out_path, mode='w+', dtype=dtype, shape=(len(orders),) + shape)
+    del cube  # the header is written; the workers open the file themselves
+    jobs = [(i, order, basename, out_path) for i, order in enumerate(orders)]
+    with Pool(processes or len(orders)) as pool:
+        for order in pool.imap_unordered(_process_into_cube, jobs):
+            logging.info('Order ' + str(order) + ' written to ' + out_path)
+    return np.load(out_path, mmap_mode='r')
+
+def stream_orders(orders, basename='WASP33_nov21_rereduced_fluxes_coadded_order_', out_dir='output/',
+                  processes=2, max_in_flight=4, load=None, save=None):
+    """
+    Streaming load -> normalize -> save pipeline, so that disk and CPU work at the same time.
+
+    A reader thread loads the next orders while worker processes normalize the current ones,
+    and a writer thread saves each result with np.save as soon as it is ready. At most
+    max_in_flight orders are held in memory at once (loaded but not yet written); the reader
+    waits when that many are in flight.
+
+    Args:
+        orders (list): order numbers.
+        out_dir (str): output directory, files are named WASP33_nov21_processed_order<N>.npy.
+        processes (int): worker processes for the normalization.
+        max_in_flight (int): memory cap, in orders.
+        load (callable, optional): load(order) -> ndarray; default np.load of the order file.
+        save (callable, optional): save(order, data); default np.save into out_dir.
+
+    Returns:
+        list: the output file names (or None for orders saved by a custom save).
+    """
+    import threading
+    import queue
+    if load is None:
+        load = lambda order: np.load(basename+str(order)+'.npy')
+    paths = {order: os.path.join(out_dir, 'WASP33_nov21_processed_order'+str(order)+'.npy') for order in orders}
+    if save is None:
+        os.makedirs(out_dir, exist_ok=True)
+        save = lambda order, data: np.save(paths[order], data)
+    else:
+        paths = dict.fromkeys(orders)
+
+    slots = threading.Semaphore(max_in_flight)
+    loaded = queue.Queue()
+    finished = queue.Queue()
+    errors = []
+
+    def reader():
+        try:
+            for order in orders:
+                slots.acquire()
+                loaded.put((order, load(order)))
+                logging.info('Prefetched order ' + str(order))
+        except Exception as err:
+            errors.append(err)
+        loaded.put(None)
+
+    def writer():
+        while True:
+            item = finished.get()
+            if item is None:
+                return
+            order, data = item
+            try:
+                if data is not None:
+                    save(order, data)
+                    logging.info('Saved order ' + str(order))
+            except Exception as err:
+                errors.append(err)
+            slots.release()
+
+    def failed(err):
+        errors.append(err)
+        finished.put((None, None))  # frees the slot of the failed order
+
+    threads = [threading.Thread(target=reader, daemon=True), threading.Thread(target=writer, daemon=True)]
+    # the pool forks its workers before the threads start, so no worker inherits a lock held by a thread
+    with Pool(processes) as pool:
+        for thread in threads:
+            thread.start()
+        pending = []
+        while True:
+            item = loaded.get()
+            if item is None:
+                break
+            order, data = item
+            del item
+            done = lambda result, order=order: finished.put((order, result))
+            pending.append(pool.apply_async(normalize_order, (data,), callback=done, error_callback=failed))
+            del data  # pickled to the worker, no need to hold on to it here
+        for result in pending:
+            result.wait()
+    finished.put(None)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return [paths[order] for order in orders]
+
+def file_digest(path, index_path=None):
+    """
+    SHA-1 of a file's content. With index_path, digests are remembered by (size, mtime) in a
+    JSON index, so an unchanged file is not read again.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    index = {}
+    if index_path and os.path.exists(index_path):
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except ValueError:
+            index = {}  # a damaged index is only a lost shortcut
+        entry = index.get(key)
+        if entry and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return entry[2]
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2**22), b''):
+            sha.update(block)
+    digest = sha.hexdigest()
+    if index_path:
+        index[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        tmp = index_path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, index_path)
+    return digest
+
+def _code_version():
+    # changes whenever the processing code does, so stale results are never served; the whole module
+    # is hashed, so no helper that takes part (select, _middle, ...) can be forgotten
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def cached_process_order(ordernumber, basename='WASP33_nov21_rereduced_fluxes_coadded_order_',
+                         cache_dir='.order_cache', max_bytes=2**32, dtype=None, threshold_factor=6):
+    """
+    process_order with a content-addressed cache of the results.
+
+    The key is the SHA-1 of the input file plus the parameters (threshold_factor, dtype) and a hash
+    of the processing code, so renamed or touched files still hit and edited inputs or code miss.
+    A hit is memory-mapped straight from the cache. Once the cache exceeds max_bytes, the least
+    recently used results are deleted.
+
+    Returns:
+        ndarray: the processed order, memory-mapped from the cache (read-only).
+    """
+    in_path = basename+str(ordernumber)+'.npy'
+    os.makedirs(cache_dir, exist_ok=True)
+    params = {'input': file_digest(in_path, os.path.join(cache_dir, 'digests.json')),
+              'threshold_factor': threshold_factor, 'dtype': None if dtype is None else np.dtype(dtype).str,
+              'code': _code_version()}
+    key = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    path = os.path.join(cache_dir, key+'.npy')
+    try:
+        os.utime(path)  # the modification time records the last use
+        data = np.load(path, mmap_mode='r')
+        logging.info('Cache hit for ' + in_path)
+        return data
+    except FileNotFoundError:
+        pass  # not cached, or just evicted by a concurrent run
+
+    data = process_order(ordernumber, basename=basename, dtype=dtype, threshold_factor=threshold_factor)
+    # write to a temporary file and rename, so a concurrent run never reads half a result
+    tmp = path + '.' + str(os.getpid()) + '.tmp.npy'
+    np.save(tmp, data)
+    os.replace(tmp, path)
+    del data
+    logging.info('Cached ' + in_path + ' as ' + path)
+
+    ### Least recently used eviction down to max_bytes, never the result just written
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.npy') and '.tmp' not in name:
+            try:
+                stat = os.stat(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                continue  # evicted by a concurrent run
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        if name != key+'.npy':
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            logging.info('Evicted ' + name + ' from the cache')
+    return np.load(path, mmap_mode='r')
+
 if __name__ == '__main__':
     logging.basicConfig(filename='logfile.log',level=logging.INFO)
 
+    import argparse
+    parser = argparse.ArgumentParser(description="Normalize the WASP33 orders")
+    parser.add_argument("order", type=int, nargs="?", default=None,
+                        help="process only this order (one interpreter per order, as started by GNU parallel)")
+    parser.add_argument("-nocache", action="store_true", help="always process, without the result cache")
+    parser.add_argument("-compare", action="store_true",
+                        help="time the loop, Pool, shared cube, stream, GNU parallel and daemon versions")
+    args = parser.parse_args()
+
     orders = [0,1,2,3,4,5,6,7,8]
-    
-    if len(sys.argv) == 1:
-        
-        proc_data = []
-        t1 = datetime.now()
-        logging.info('Starting for loop')
-        for order in orders:
-            proc_data.append(process_order(order))
-        t2 = datetime.now()
-        logging.info('For loop time: ' +str(t2-t1))
-
-        ### Here's the pool version
-        t3 = datetime.now()
-        logging.info('Starting pool')
-        pool = Pool(len(orders))
-        processed_data = pool.map(process_order, orders)
-        pool.close()
-        pool.join()
-        t4 = datetime.now()
-        logging.info('Pool time: ' +str(t4-t3))
+    process = process_order if args.nocache else cached_process_order
+
+    ### One order per interpreter, as started by GNU parallel:
+    ###     parallel -j 9 python discussion17_activity1_solution.py ::: 0 1 2 3 4 5 6 7 8
+    if args.order is not None:
+        process(args.order)
+        sys.exit()
+
+    ### With the result cache only orders whose input (or the code) changed are processed again
+    t1 = datetime.now()
+    logging.info('Starting cached loop')
+    cached_data = [process(order) for order in orders]
+    t2 = datetime.now()
+    logging.info('Cached loop time: ' +str(t2-t1))
+
+    ### The comparisons below all process every order again
+    if not args.compare:
+        sys.exit()
+
+    proc_data = []
+    t1 = datetime.now()
+    logging.info('Starting for loop')
+    for order in orders:
+        proc_data.append(process_order(order))
+    t2 = datetime.now()
+    logging.info('For loop time: ' +str(t2-t1))
+
+    ### Here's the pool version
+    t3 = datetime.now()
+    logging.info('Starting pool')
+    pool = Pool(len(orders))
+    processed_data = pool.map(process_order, orders)
+    pool.close()
+    pool.join()
+    t4 = datetime.now()
+    logging.info('Pool time: ' +str(t4-t3))
+
+    ### Pool writing into one memory-mapped output cube: nothing is pickled back,
+    ### so the memory use stays close to one copy of the data
+    t3 = datetime.now()
+    logging.info('Starting pool with shared output cube')
+    processed_cube = process_orders_shared(orders)
+    t4 = datetime.now()
+    logging.info('Shared-cube pool time: ' +str(t4-t3))
+
+    ### Streaming: a reader thread prefetches orders, the pool normalizes them and a writer
+    ### thread saves each one as soon as it is done, at most max_in_flight orders in memory
+    t3 = datetime.now()
+    logging.info('Starting streaming pipeline')
+    stream_orders(orders, processes=len(orders), max_in_flight=len(orders))
+    t4 = datetime.now()
+    logging.info('Streaming pipeline time: ' +str(t4-t3))
 
     ### Save the output
     # if not os.path.exists('output/'):
@@ -66,14 +588,24 @@ if __name__ == '__main__':
 
     ### Write a use GNU parallel for execution, taking the 
     ### order numbers as command line arguments. How does the runtime compare?
-	
-    if len(sys.argv) == 2:
-        process_order(int(sys.argv[1]))
-
-    cmd = f'parallel -j {len(orders)} python discussion17_activity1_template.py ::: {orders}'
+    order_args = ' '.join(str(order) for order in orders)
+    cmd = f'parallel -j {len(orders)} python discussion17_activity1_solution.py -nocache ::: {order_args}'
     logging.info('Running GNU parallel command: ' + cmd)
     t5 = datetime.now()
     subprocess.run(cmd,shell=True)
     t6 = datetime.now()
     logging.info('GNU parallel time: ' +str(t6-t5))
     logging.info('Finished GNU parallel execution')
+
+    ### Every interpreter above imports numpy again. With the worker daemon (order_daemon.py)
+    ### numpy is imported once; parallel only starts thin clients that send it the order numbers
+    from order_daemon import start_daemon, request
+    daemon = start_daemon(processes=len(orders))
+    cmd = f'parallel -j {len(orders)} python order_daemon.py ::: {order_args}'
+    logging.info('Running GNU parallel with the worker daemon: ' + cmd)
+    t5 = datetime.now()
+    subprocess.run(cmd,shell=True)
+    t6 = datetime.now()
+    request({'stop': True})
+    daemon.wait()
+    logging.info('GNU parallel with daemon time: ' +str(t6-t5))
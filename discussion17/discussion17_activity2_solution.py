@@ -20,6 +20,8 @@ parser.add_argument("-v0y", type=float, default=1e7, help="initial velocity in y
 parser.add_argument("-v0z", type=float, default=1e7, help="initial velocity in z direction (m/s)")
 parser.add_argument("-dt", type=float, default=1e-10, help="time step in seconds")
 parser.add_argument("-steps", type=int, default=10000, help="number of time steps to simulate")
+parser.add_argument("-method", type=str, default="rk4", choices=["rk4", "boris", "exact"],
+                    help="integrator: rk4, boris (energy-conserving, allows larger dt) or exact (analytic rotation for uniform B)")
 ### add more arguments as needed, e.g., magnetic field strength, initial position, etc.
 
 # ---- Parse Arguments ----
@@ -56,6 +58,55 @@ def rk4_integration(q, m, r0, v0):
 
     return r # r includes position information [x,y,z] at each step
 
+# use the Boris pusher: rotate v by the magnetic field each step, then move r with the new v.
+# |v| is conserved exactly, so the orbit does not spiral in or out even at 10-100x larger dt.
+def boris_integration(q, m, r0, v0):
+    r = np.zeros((steps, 3))
+    r[0] = r0
+
+    def rotate(v, h):
+        t = (q/m) * B_field * h/2
+        s = 2*t / (1 + np.dot(t, t))
+        v_prime = v + np.cross(v, t)
+        return v + np.cross(v_prime, s)
+
+    v = rotate(np.asarray(v0, dtype=float), -dt/2)  # velocity lives at half steps, start at -dt/2
+    for i in range(steps-1):
+        v = rotate(v, dt)
+        r[i+1] = r[i] + v*dt
+
+    return r
+
+# exact solution for a uniform B: v rotates about B at the gyrofrequency,
+# so each step is a rotation of v plus the closed-form integral of r
+def exact_rotation_integration(q, m, r0, v0):
+    r = np.zeros((steps, 3))
+    r[0] = r0
+    v = np.asarray(v0, dtype=float)
+
+    B_mag = np.linalg.norm(B_field)
+    omega = abs(q/m) * B_mag
+    n = -np.sign(q/m) * B_field / B_mag  # dv/dt = (q/m) v x B = omega n x v
+    phi = omega*dt
+    # sin(phi)/omega and (1 - cos(phi))/omega written with sinc, which has no 0/0 for q = 0
+    # and no cancellation for tiny phi: they go to dt and 0, i.e. straight-line motion
+    int_cos = dt*np.sinc(phi/np.pi)
+    int_sin = dt*phi/2*np.sinc(phi/(2*np.pi))**2
+    for i in range(steps-1):
+        v_par = np.dot(v, n) * n
+        v_perp = v - v_par
+        n_x_v = np.cross(n, v_perp)
+        r[i+1] = r[i] + v_par*dt + int_cos*v_perp + int_sin*n_x_v
+        v = v_par + np.cos(phi)*v_perp + np.sin(phi)*n_x_v
+
+    return r
+
+integrators = {
+    "rk4": rk4_integration,
+    "boris": boris_integration,
+    "exact": exact_rotation_integration,
+}
+
 def plot_trajectory(r, label, save=True, plot=False, outfile='trajectory.png'):
     fig = plt.figure(figsize=(8, 6))
     ax = fig.add_subplot(111, projection='3d')
@@ -97,13 +148,14 @@ if __name__ == "__main__":
     t = np.linspace(0, steps*dt, steps)
 
     outfilename = f'{args.particle}_trajectory'
-    r_traj = rk4_integration(q, m, r0, v0)
+    r_traj = integrators[args.method](q, m, r0, v0)
     tab = Table(r_traj, names=('x','y','z'))
     tab.meta['q'] = q
     tab.meta['m'] = m
     tab.meta['v0'] = (args.v0x, args.v0y, args.v0z)
     tab.meta['dt'] = dt
     tab.meta['steps'] = steps   
+    tab.meta['method'] = args.method
     tab.write(f'{outfilename}_data.fits', overwrite=True)
     plot_trajectory(r_traj, args.particle.capitalize(), save=True, plot=False, outfile=f'{outfilename}_3d.png')
     
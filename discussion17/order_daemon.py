@@ -0,0 +1,162 @@
+'''
+Persistent worker service for process_order (discussion17_activity1_solution.py), driven by GNU parallel.
+
+    parallel -j 9 python discussion17_activity1_solution.py ::: 0 1 2 3 4 5 6 7 8
+
+starts one interpreter per order, and each of them imports numpy again before doing any work.
+The daemon imports numpy once and keeps a Pool of workers; orders are sent to it over a Unix
+socket. The client side of this script only uses the standard library, so each order now costs
+a bare interpreter start. The daemon saves every processed order to
+out_dir/WASP33_nov21_processed_order<N>.npy, and the client prints that path.
+
+    python order_daemon.py -serve -processes 9 &
+    parallel -j 9 python order_daemon.py ::: 0 1 2 3 4 5 6 7 8
+    python order_daemon.py -stop
+
+Protocol: one JSON line per connection, e.g. {"order": 3} or {"stop": true}, answered by one
+JSON line {"ok": true, "path": ...} or {"ok": false, "error": ...}.
+'''
+import os
+import sys
+import json
+import time
+import socket
+import socketserver
+import subprocess
+import threading
+
+SOCKET = os.environ.get('ORDER_DAEMON_SOCKET', '.order_daemon.sock')
+BASENAME = 'WASP33_nov21_rereduced_fluxes_coadded_order_'
+
+
+# ==== Server ====
+
+def _process_and_save(order, basename, out_dir):
+    # runs in a pool worker, which inherited the daemon's imports
+    import numpy as np
+    from discussion17_activity1_solution import process_order
+    path = os.path.join(out_dir, 'WASP33_nov21_processed_order'+str(order)+'.npy')
+    np.save(path, process_order(order, basename=basename))
+    return path
+
+
+def serve(path=SOCKET, processes=None, basename=BASENAME, out_dir='output/'):
+    """
+    Runs the daemon until a {"stop": true} request arrives.
+
+    Args:
+        path (str): Unix socket to listen on.
+        processes (int): pool workers, default os.cpu_count().
+        basename (str): default basename of the order files (a request may give its own).
+        out_dir (str): directory for the processed orders.
+    """
+    import logging
+    from multiprocessing import Pool
+    # intentional warm-up: numpy and the solution module are imported here, once, and the
+    # pool workers forked below inherit them, so _process_and_save finds them already loaded
+    import discussion17_activity1_solution  # noqa: F401
+
+    if os.path.exists(path):
+        try:
+            request({'ping': True}, path=path)
+        except OSError:
+            os.unlink(path)  # left behind by a daemon that was killed
+        else:
+            raise RuntimeError(f'a daemon is already listening on {path}')
+    os.makedirs(out_dir, exist_ok=True)
+
+    with Pool(processes) as pool:
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                message = json.loads(self.rfile.readline())
+                if message.get('stop'):
+                    reply = {'ok': True}
+                    threading.Thread(target=server.shutdown).start()
+                elif message.get('ping'):
+                    reply = {'ok': True}
+                else:
+                    try:
+                        order = int(message['order'])
+                        saved = pool.apply(_process_and_save, (order, message.get('basename', basename), out_dir))
+                        reply = {'ok': True, 'path': saved}
+                        logging.info('Daemon processed order ' + str(order))
+                    except Exception as err:
+                        reply = {'ok': False, 'error': f'{type(err).__name__}: {err}'}
+                self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+        # one thread per connection, so the pool sees all requests of a parallel run at once
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            os.unlink(path)
+
+
+def start_daemon(path=SOCKET, processes=None, cwd=None, timeout=60.):
+    """
+    Starts serve() in a background process (in directory cwd, where the order files are)
+    and returns it once the socket accepts requests.
+    """
+    cmd = [sys.executable, os.path.abspath(__file__), '-serve', '-socket', path]
+    if processes:
+        cmd += ['-processes', str(processes)]
+    daemon = subprocess.Popen(cmd, cwd=cwd)
+    t_end = time.monotonic() + timeout
+    while True:
+        try:
+            request({'ping': True}, path=path if cwd is None else os.path.join(cwd, path))
+            return daemon
+        except OSError:
+            if daemon.poll() is not None or time.monotonic() > t_end:
+                daemon.kill()
+                raise RuntimeError('the order daemon did not start')
+            time.sleep(0.02)
+
+
+# ==== Client ====
+
+def request(message, path=SOCKET):
+    """Sends one request to the daemon and returns its reply (a dict)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(message).encode() + b'\n')
+        with sock.makefile('rb') as reply:
+            return json.loads(reply.readline())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Process orders through the persistent worker daemon")
+    parser.add_argument("orders", type=int, nargs="*", help="order numbers to process (client mode)")
+    parser.add_argument("-serve", action="store_true", help="run the daemon")
+    parser.add_argument("-stop", action="store_true", help="stop a running daemon")
+    parser.add_argument("-processes", type=int, default=None, help="pool workers of the daemon")
+    parser.add_argument("-socket", type=str, default=SOCKET, help="Unix socket of the daemon")
+    parser.add_argument("-basename", type=str, default=None, help="basename of the order files")
+    parser.add_argument("-out_dir", type=str, default="output/", help="directory for the processed orders (daemon)")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.socket, processes=args.processes, basename=args.basename or BASENAME, out_dir=args.out_dir)
+        sys.exit()
+    if args.stop:
+        request({'stop': True}, path=args.socket)
+        sys.exit()
+
+    failed = False
+    for order in args.orders:
+        message = {'order': order}
+        if args.basename:
+            message['basename'] = args.basename
+        reply = request(message, path=args.socket)
+        if reply['ok']:
+            print(reply['path'])
+        else:
+            print(f"order {order}: {reply['error']}", file=sys.stderr)
+            failed = True
+    # a non-zero exit status lets parallel report the failed orders
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,169 @@
+'''
+Mergeable quantile sketch (KLL-style compactors) for medians of data that does not fit in memory.
+
+The sketch keeps items on levels h = 0, 1, 2, ...; an item on level h stands for 2^h input values.
+New values go to level 0. When a level holds k or more items they are sorted and every other one
+(starting at a random offset 0 or 1) moves up a level, so the level's memory is halved while
+every rank is kept to within one item weight. The sketch of n values therefore holds at most about
+k log2(n/k) items. Two sketches of different parts of a stream merge into a sketch of the whole
+stream.
+
+Error bound: each compaction on level h shifts the rank of any value by 0 or +-2^h, with a random
+sign. By Hoeffding's inequality the rank error of a quantile exceeds
+
+    t = sqrt(2 ln(2/delta) sum(w^2))
+
+with probability at most delta, the sum going over the weights w = 2^h of all compactions so far.
+rank_error(delta) returns t/n, the bound as a fraction of the stream length; it is about 1/k.
+Nothing is compacted until a level fills, so short streams are exact (rank_error = 0).
+
+The sketch is vectorized over independent streams of the same length, e.g. one per column of
+a spectral order: update(block) adds block[i] to stream i for every row of the block. NaNs are
+ignored like in np.nanmedian: they sort last and quantiles are taken over the finite count.
+
+Example:
+    sketch = QuantileSketch(k=200, shape=(n_pix,))
+    for block in blocks:        # (rows, n_pix)
+        sketch.update(block)
+    medspec = sketch.quantile(0.5)
+    print(sketch.rank_error())  # e.g. 0.004
+'''
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Approximate quantiles of one or more streams of values.
+
+    Attributes:
+        k (int): level capacity; memory and accuracy grow with k.
+        shape (tuple): shape of the set of streams, () for a single stream.
+        n (int): number of values seen per stream (NaNs included).
+        count (ndarray): number of non-NaN values per stream.
+    """
+
+    def __init__(self, k=200, shape=(), seed=None):
+        self.k = int(k)
+        self.shape = tuple(shape)
+        self.n = 0
+        self.count = np.zeros(self.shape, dtype=np.int64)
+        self._levels = []  # levels[h]: list of (m, *shape) arrays
+        self._sum_w2 = 0.0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """Adds values of shape (m, *shape): m new values for every stream."""
+        values = np.asarray(values)
+        if values.shape[1:] != self.shape:
+            values = values.reshape((-1,) + self.shape)
+        self.n += values.shape[0]
+        self.count += np.count_nonzero(~np.isnan(values), axis=0)
+        self._add(0, np.array(values, dtype=float, copy=True))
+        self._compress()
+
+    def merge(self, other):
+        """Adds the values seen by other (a sketch with the same k and shape)."""
+        if other.shape != self.shape:
+            raise ValueError(f"cannot merge sketches of shapes {self.shape} and {other.shape}")
+        self.n += other.n
+        self.count += other.count
+        self._sum_w2 += other._sum_w2
+        for h, level in enumerate(other._levels):
+            for items in level:
+                self._add(h, items)
+        self._compress()
+        return self
+
+    def _add(self, h, items):
+        while len(self._levels) <= h:
+            self._levels.append([])
+        self._levels[h].append(items)
+
+    def _compress(self):
+        h = 0
+        while h < len(self._levels):
+            level = self._levels[h]
+            size = sum(items.shape[0] for items in level)
+            if size >= self.k:
+                items = np.sort(np.concatenate(level), axis=0)
+                m = size - size % 2
+                # every other item of the sorted buffer, independently random offset per stream
+                offset = self._rng.integers(0, 2, self.shape)
+                idx = offset + np.arange(0, m, 2).reshape((-1,) + (1,)*len(self.shape))
+                self._levels[h] = [items[m:]] if m < size else []
+                self._add(h + 1, np.take_along_axis(items, idx, axis=0))
+                self._sum_w2 += 4.0**h
+            h += 1
+
+    @property
+    def size(self):
+        """Items held per stream."""
+        return sum(items.shape[0] for level in self._levels for items in level)
+
+    def rank_error(self, delta=1e-3):
+        """Rank error bound as a fraction of n, holding for any one quantile with probability 1 - delta."""
+        if self.n == 0:
+            return 0.0
+        return np.sqrt(2*np.log(2/delta)*self._sum_w2)/self.n
+
+    def quantile(self, q):
+        """
+        Approximate q-quantile of every stream (NaN for streams without finite values).
+
+        Returns:
+            ndarray or float: one value per stream, with the shape of the set of streams.
+        """
+        items = [(items, 2**h) for h, level in enumerate(self._levels) for items in level]
+        values = np.concatenate([v for v, _ in items])
+        weights = np.concatenate([np.full(v.shape[0], w, dtype=np.int64) for v, w in items])
+        order = np.argsort(values, axis=0)  # NaNs last
+        values = np.take_along_axis(values, order, axis=0)
+        cum = np.cumsum(weights[order], axis=0)
+        # the smallest value whose weighted rank reaches q of the finite values
+        target = np.maximum(np.ceil(q*self.count), 1)
+        idx = np.argmax(cum >= target, axis=0)
+        result = np.take_along_axis(values, np.expand_dims(idx, 0), axis=0)[0]
+        result = np.where(self.count > 0, result, np.nan)
+        return result if self.shape else float(result)
+
+
+# ==== Benchmark: accuracy and memory against exact medians ====
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Quantile sketch accuracy against exact medians")
+    parser.add_argument("-n", type=int, default=200000, help="values per stream")
+    parser.add_argument("-streams", type=int, default=256, help="independent streams (columns)")
+    parser.add_argument("-k", type=int, nargs="+", default=[64, 200, 800], help="level capacities")
+    parser.add_argument("-chunk", type=int, default=1000, help="rows per update")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((args.n, args.streams))*rng.uniform(0.5, 2, args.streams) + rng.uniform(-1, 1, args.streams)
+    t0 = time.perf_counter()
+    exact = np.median(data, axis=0)
+    t_exact = time.perf_counter() - t0
+    sorted_data = np.sort(data, axis=0)
+    print(f"{args.streams} streams of {args.n} values; exact np.median {t_exact:.2f} s with all {data.nbytes/2**20:.0f} MB in memory")
+    for k in args.k:
+        t0 = time.perf_counter()
+        sketch = QuantileSketch(k=k, shape=(args.streams,), seed=1)
+        for start in range(0, args.n, args.chunk):
+            sketch.update(data[start:start+args.chunk])
+        approx = sketch.quantile(0.5)
+        t_sketch = time.perf_counter() - t0
+        # the achieved rank error of each stream's median
+        ranks = np.array([np.searchsorted(sorted_data[:, j], approx[j]) for j in range(args.streams)])
+        achieved = np.max(np.abs(ranks/args.n - 0.5))
+        print(f"k = {k:4d}: {t_sketch:.2f} s, {sketch.size} items per stream ({sketch.size/args.n:.2%} of the data),"
+              f" max rank error {achieved:.4f} (bound {sketch.rank_error():.4f} at delta=1e-3),"
+              f" max |median error| {np.max(np.abs(approx - exact)):.4f}")
+
+    # merging sketches of two halves equals one sketch of the whole stream
+    a, b = QuantileSketch(k=200, shape=(args.streams,), seed=2), QuantileSketch(k=200, shape=(args.streams,), seed=3)
+    a.update(data[:args.n//2])
+    b.update(data[args.n//2:])
+    merged = a.merge(b).quantile(0.5)
+    print(f"merged halves: max |median error| {np.max(np.abs(merged - exact)):.4f}, bound {a.rank_error():.4f}")
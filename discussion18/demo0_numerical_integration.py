@@ -22,6 +22,13 @@ print(f"simpson: {simpson(y,x)}")
 result, error = quad(f, 0, np.pi/2)
 print(f"quad: {result}")
 
+# Refining n_samples evaluates f again at every point. Doubling the number of intervals
+# keeps the old samples as grid points, so only the midpoints are new, and the same
+# samples give trapezoid, Simpson and Romberg estimates (see romberg.py)
+from romberg import romberg
+res = romberg(f, 0, np.pi/2, rtol=1e-12)
+print(f"romberg: {res.value} ({res.nfev} evaluations; trapezoid {res.trapezoid}, simpson {res.simpson} on the same samples)")
+
 # Plotting trapezoidal rule
 fig = plt.figure(figsize=(8, 6))
 plt.plot(x, y, color='tab:blue')
@@ -51,3 +58,10 @@ flux_trap = trapezoid(B_lambda(lam, 5800),lam)
 flux_quad = quad(B_lambda, 400e-9, 700e-9, args=(5800,))[0]
 
 print(f"Integrating blackbody flux from 400 nm to 700 nm at T=5800 K: \n trapezoid: {flux_trap} W/m^2/sr\n quad: {flux_quad} W/m^2/sr")
+
+# For many temperatures and bands at once, a fixed-order Gauss-Legendre rule evaluated
+# on whole arrays is hundreds of times faster than a quad call per pair (see band_flux.py)
+from band_flux import band_flux
+temps = np.array([3000, 5800, 10000])
+flux_gl, err_gl = band_flux(temps, [[400e-9, 700e-9]])
+print(f" Gauss-Legendre at T = {temps} K: {flux_gl[:, 0]} W/m^2/sr (error estimate {err_gl[:, 0]})")
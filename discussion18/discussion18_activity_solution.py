@@ -1,6 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.integrate import quad
+from enclosed_mass import enclosed_mass, exponential_density
 
 # === galaxy rotation curve ===
 # Make a simple model of galaxy rotation curve
@@ -12,12 +12,6 @@ def v_circular(r, M):
     G = 6.67430e-11  # m^3 kg^-1 s^-2
     return np.sqrt(G * M / r)
 
-# calculate enclosed mass for a given radius with a exponential density profile
-def mass_enclosed(r, rho0, r0):
-    integrand = lambda r_prime: 4 * np.pi * r_prime**2 * rho0 * np.exp(-r_prime / r0)
-    M, err = quad(integrand, 0, r)
-    return M
-
 # ------ Integration and Plotting ------
 
 # For convenience, assume an exponential density profile: rho(r) = rho0*exp(-r/r0)
@@ -27,6 +21,7 @@ r0 = 3.0    # in kpc
 
 # For convenience, assume dark matter halo density profile: rho(r) = rho0_dm*exp(-r/r0_dm)
 # Commonly used models for dark matter halo density profile include NFW, Einasto, Burkert, etc.
+# (halo_models.py has all of them as tabulated models, fast enough to fit many galaxies.)
 # Here we just use an exponential for simplicity.
 # Change rho0_dm and r0_dm to see different effects.
 rho0_dm = 1e6  # in Msun/kpc^3
@@ -35,12 +30,14 @@ r0_dm = 10.0   # in kpc
 radii = np.linspace(1, 30, 1000)  # in kpc
 ### Find the enclosed mass at each radii and the corresponding velocities
 # for convenience, adding a constant central mass
-masses = np.array([mass_enclosed(r, rho0, r0)+4e6 for r in radii])  # in Msun
+# Integrating from 0 with quad for every radius repeats the inner region each time; enclosed_mass
+# returns M(<r) on the whole grid at once (closed form for the exponential, see enclosed_mass.py)
+masses = enclosed_mass(exponential_density, radii, args=(rho0, r0)) + 4e6  # in Msun
 velocities = v_circular(radii * 3e19, masses * 2e30)  # convert kpc to m and Msun to kg
 velocities /= 1e3  # convert to km/s
 
 ### Now include dark matter halo
-masses_dm = np.array([mass_enclosed(r, rho0_dm, r0_dm) for r in radii])  # in Msun
+masses_dm = enclosed_mass(exponential_density, radii, args=(rho0_dm, r0_dm))  # in Msun
 masses_total = masses + masses_dm
 velocities_total = v_circular(radii * 3e19, masses_total * 2e30)  # convert kpc to m and Msun to kg
 velocities_total /= 1e3  # convert to km/s
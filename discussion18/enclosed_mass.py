@@ -0,0 +1,163 @@
+'''
+Enclosed mass M(<r) of a spherical density profile on a whole grid of radii at once.
+
+The activity computes M(<r) = int_0^r 4 pi r'^2 rho(r') dr' with one quad call per radius,
+so for 1000 radii the inner region is integrated 1000 times over. Here the radii split
+[0, r_max] into shells [r_{i-1}, r_i], each shell is integrated once and M(<r_i) is the
+running sum of the shells. The shells are integrated with Gauss-Legendre rules on all
+of them together (one vectorized density call per pass): a shell whose estimate changes
+by more than rtol when it is split in two is split, and only the split pieces are
+integrated again. Because the density is positive, every M(<r_i) then has a relative
+error of about rtol. Shells far out in a steep tail, whose error is below the rounding
+of the mass already enclosed, are accepted as they are.
+
+Profiles with a known M(<r) skip the integration: enclosed_mass() looks the density
+function up in CLOSED_FORMS. The exponential profile of the activity has
+
+    M(<r) = 4 pi rho0 r0^3 int_0^x t^2 e^-t dt = 8 pi rho0 r0^3 P(3, x),  x = r/r0
+
+with P the regularized lower incomplete gamma function, which stays accurate for small x
+where 2 - e^-x (x^2 + 2x + 2) would cancel.
+
+Example:
+    M = enclosed_mass(exponential_density, radii, args=(rho0, r0))
+    M, err = cumulative_mass(lambda r: rho0/(r/rs*(1 + r/rs)**2), radii)
+'''
+import time
+import numpy as np
+from scipy.special import gammainc
+
+
+# ==== Profiles with a closed form ====
+
+def exponential_density(r, rho0, r0):
+    return rho0*np.exp(-r/r0)
+
+def exponential_mass(r, rho0, r0):
+    return 8*np.pi*rho0*r0**3*gammainc(3, np.asarray(r)/r0)
+
+# density function -> M(<r) function with the same extra arguments
+CLOSED_FORMS = {
+    exponential_density: exponential_mass,
+}
+
+
+# ==== Cumulative integration for any density ====
+
+def _gauss_legendre(order):
+    # nodes and weights on [0, 1]
+    x, w = np.polynomial.legendre.leggauss(order)
+    return (x + 1)/2, w/2
+
+
+def cumulative_mass(density, radii, args=(), order=8, rtol=1e-10, max_splits=30):
+    """
+    Enclosed mass at every radius in one pass.
+
+    Args:
+        density (callable): density(r, *args), vectorized over an ndarray r.
+        radii (ndarray): radii at which to return M(<r), any order, all >= 0.
+        args (tuple): extra arguments for density.
+        order (int): Gauss-Legendre points per shell.
+        rtol (float): relative accuracy of each shell (and therefore of each M(<r)).
+        max_splits (int): maximum number of times a shell is halved.
+
+    Returns:
+        tuple: M(<r) and its error estimate, both with the shape of radii.
+    """
+    radii = np.asarray(radii, dtype=float)
+    r = radii.ravel()
+    order_idx = np.argsort(r, kind='stable')
+    edges = np.concatenate(([0.0], r[order_idx]))
+    nodes, weights = _gauss_legendre(order)
+
+    def rule(a, b):
+        h = b - a
+        x = a[:, None] + h[:, None]*nodes
+        return h*((4*np.pi*x**2*density(x, *args)) @ weights)
+
+    n = r.size
+    shells = np.zeros(n)
+    errors = np.zeros(n)
+    a, b, owner = edges[:-1], edges[1:], np.arange(n)
+    whole = rule(a, b)
+    # mass inside each shell; an error far below it cannot change M(<r) in double precision
+    inner = np.concatenate(([0.0], np.cumsum(np.abs(whole))[:-1]))
+    for level in range(max_splits + 1):
+        m = (a + b)/2
+        left, right = rule(a, m), rule(m, b)
+        halves = left + right
+        err = np.abs(whole - halves)
+        done = ((err <= rtol*np.abs(halves)) | (err <= np.finfo(float).eps*inner[owner])
+                | (level == max_splits))
+        np.add.at(shells, owner[done], halves[done])
+        np.add.at(errors, owner[done], err[done])
+        if done.all():
+            break
+        # only the unfinished pieces are split; their halves are already integrated
+        todo = ~done
+        a, b = np.concatenate((a[todo], m[todo])), np.concatenate((m[todo], b[todo]))
+        owner = np.concatenate((owner[todo], owner[todo]))
+        whole = np.concatenate((left[todo], right[todo]))
+
+    M = np.empty(n)
+    err = np.empty(n)
+    M[order_idx] = np.cumsum(shells)
+    err[order_idx] = np.cumsum(errors)
+    return M.reshape(radii.shape), err.reshape(radii.shape)
+
+
+def enclosed_mass(density, radii, args=(), **kwargs):
+    """
+    M(<r) on a grid of radii: the closed form if the profile is in CLOSED_FORMS,
+    otherwise cumulative_mass (kwargs are passed on to it).
+    """
+    closed = CLOSED_FORMS.get(density)
+    if closed is not None:
+        return closed(np.asarray(radii, dtype=float), *args)
+    return cumulative_mass(density, radii, args=args, **kwargs)[0]
+
+
+# ==== Benchmark against one quad call per radius ====
+
+if __name__ == "__main__":
+    import argparse
+    from scipy.integrate import quad
+
+    parser = argparse.ArgumentParser(description="Cumulative enclosed mass vs one quad per radius")
+    parser.add_argument("-n", type=int, nargs="+", default=[100, 1000, 10000], help="number of radii")
+    args = parser.parse_args()
+
+    rho0, r0 = 1e7, 3.0  # the activity's exponential disk, Msun/kpc^3 and kpc
+    rs = 20.0  # an NFW halo, which has no entry in CLOSED_FORMS
+    nfw = lambda r: rho0/(r/rs*(1 + r/rs)**2)
+    nfw_exact = lambda r: 4*np.pi*rho0*rs**3*(np.log1p(r/rs) - r/(r + rs))
+
+    for n in args.n:
+        radii = np.linspace(1, 30, n)
+        for label, density, extra, exact in [("exponential", exponential_density, (rho0, r0), exponential_mass(radii, rho0, r0)),
+                                            ("NFW", nfw, (), nfw_exact(radii))]:
+            t0 = time.perf_counter()
+            M_quad = np.array([quad(lambda x: 4*np.pi*x**2*density(x, *extra), 0, r)[0] for r in radii])
+            t_quad = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            M_cum, err = cumulative_mass(density, radii, args=extra)
+            t_cum = time.perf_counter() - t0
+            line = (f"{label:>11s}, {n:5d} radii: quad per radius {t_quad:.3f} s (max rel err {np.max(np.abs(M_quad/exact - 1)):.1e}) |"
+                    f" cumulative {t_cum*1e3:.2f} ms (max rel err {np.max(np.abs(M_cum/exact - 1)):.1e},"
+                    f" estimate {np.max(err/M_cum):.1e}), speedup {t_quad/t_cum:.0f}x")
+            if density in CLOSED_FORMS:
+                t0 = time.perf_counter()
+                enclosed_mass(density, radii, args=extra)
+                line += f" | closed form {(time.perf_counter() - t0)*1e3:.3f} ms"
+            print(line)
+
+    # radii far out in the exponential tail: the shells there carry less mass than the rounding
+    # of M(<r) and are accepted without splitting, instead of being halved max_splits times
+    radii = np.linspace(1, 1000*r0, 1000)
+    t0 = time.perf_counter()
+    M_cum, err = cumulative_mass(exponential_density, radii, args=(rho0, r0))
+    t_cum = time.perf_counter() - t0
+    exact = exponential_mass(radii, rho0, r0)
+    print(f"exponential out to {1000*r0:.0f} kpc: cumulative {t_cum*1e3:.2f} ms,"
+          f" max rel err {np.max(np.abs(M_cum/exact - 1)):.1e}")
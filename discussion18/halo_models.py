@@ -0,0 +1,225 @@
+'''
+Rotation-curve model library: exponential, NFW, Einasto and Burkert mass profiles.
+
+Every profile is rho(r) = rho_s f(r/r_s) for a dimensionless shape f, so its enclosed mass is
+
+    M(<r) = rho_s r_s^3 mu(r/r_s),   mu(x) = int_0^x 4 pi t^2 f(t) dt
+
+and mu does not depend on rho_s or r_s. mu is tabulated once per profile (with
+enclosed_mass.cumulative_mass) on a log grid of x, stored in CACHE_DIR, and read back by
+later runs. A model evaluation is then a cubic spline in (ln x, ln mu) plus a rescaling,
+well under a millisecond for a 1000-point curve, instead of a quad call per radius. Einasto has a
+second shape parameter alpha, so its table is 2D in (alpha, ln x).
+Outside the table the log-log slope at the edge is continued (a power law).
+
+Radii are in kpc, densities in Msun/kpc^3 and velocities in km/s.
+
+Example:
+    v = rotation_curve(radii, [('exponential', dict(rho_s=1e7, r_s=3.0)),
+                               ('nfw', dict(rho_s=5e6, r_s=20.0))], central_mass=4e6)
+'''
+import os
+import time
+from functools import lru_cache
+import numpy as np
+from scipy.interpolate import CubicSpline, RectBivariateSpline
+from enclosed_mass import cumulative_mass
+
+G = 4.30091e-6  # kpc (km/s)^2 / Msun
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mass_tables')
+
+# dimensionless shapes f(x), x = r/r_s
+PROFILES = {
+    'exponential': lambda x: np.exp(-x),
+    'nfw': lambda x: 1/(x*(1 + x)**2),
+    'burkert': lambda x: 1/((1 + x)*(1 + x**2)),
+    'einasto': lambda x, alpha: np.exp(-2/alpha*(x**alpha - 1)),
+}
+# grids of the extra shape parameter for the profiles that have one
+SHAPE_GRIDS = {
+    'einasto': np.linspace(0.08, 1.0, 93),
+}
+LOG_X = np.linspace(np.log(1e-6), np.log(1e6), 2401)
+
+
+# ==== Dimensionless mass tables ====
+
+def _build_table(name):
+    x = np.exp(LOG_X)
+    f = PROFILES[name]
+    if name in SHAPE_GRIDS:
+        return np.array([np.log(cumulative_mass(f, x, args=(s,))[0]) for s in SHAPE_GRIDS[name]])
+    return np.log(cumulative_mass(f, x)[0])
+
+
+def mass_table(name, cache_dir=None, rebuild=False):
+    """
+    ln mu on LOG_X (and on SHAPE_GRIDS[name] for Einasto), from the disk cache if possible.
+
+    Returns:
+        ndarray: shape (len(LOG_X),), or (len(SHAPE_GRIDS[name]), len(LOG_X)).
+    """
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile {name!r}, choose from {list(PROFILES)}")
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    path = os.path.join(cache_dir, name + '.npz')
+    shape_grid = SHAPE_GRIDS.get(name, np.zeros(0))
+    if not rebuild and os.path.exists(path):
+        with np.load(path) as cached:
+            # only reuse a table made on the same grids
+            if np.array_equal(cached['log_x'], LOG_X) and np.array_equal(cached['shape_grid'], shape_grid):
+                return cached['log_mu']
+    log_mu = _build_table(name)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, log_x=LOG_X, shape_grid=shape_grid, log_mu=log_mu)
+    os.replace(tmp, path)  # other processes never see a half-written table
+    return log_mu
+
+
+@lru_cache(maxsize=None)
+def _spline(name):
+    log_mu = mass_table(name)
+    if name in SHAPE_GRIDS:
+        return RectBivariateSpline(SHAPE_GRIDS[name], LOG_X, log_mu, kx=3, ky=3)
+    return CubicSpline(LOG_X, log_mu)
+
+
+def _eval(spline, u, shape=None, dy=0):
+    if shape is None:
+        return spline(u, dy)
+    # the 2D spline is much faster on a grid, which needs sorted points
+    order = np.argsort(u, kind='stable')
+    out = np.empty_like(u)
+    out[order] = spline([shape], u[order], dy=dy)[0]
+    return out
+
+
+def _log_mu(name, log_x, shape=None):
+    spline = _spline(name)
+    log_x = np.asarray(log_x, dtype=float)
+    flat = log_x.ravel()
+    u = np.clip(flat, LOG_X[0], LOG_X[-1])
+    y = _eval(spline, u, shape)
+    outside = u != flat
+    if outside.any():
+        # power-law continuation outside the table
+        y[outside] += _eval(spline, u[outside], shape, dy=1)*(flat - u)[outside]
+    return y.reshape(log_x.shape)
+
+
+# ==== Models ====
+
+def model_mass(name, r, rho_s, r_s, alpha=None):
+    """
+    Enclosed mass of one profile.
+
+    Args:
+        name (str): one of PROFILES.
+        r (ndarray): radii in kpc.
+        rho_s (float): density scale in Msun/kpc^3 (rho0 of the exponential profile).
+        r_s (float): scale radius in kpc.
+        alpha (float, optional): Einasto shape parameter, within SHAPE_GRIDS['einasto'].
+
+    Returns:
+        ndarray: M(<r) in Msun.
+    """
+    r = np.asarray(r, dtype=float)
+    if name in SHAPE_GRIDS:
+        grid = SHAPE_GRIDS[name]
+        if alpha is None or not grid[0] <= alpha <= grid[-1]:
+            raise ValueError(f"{name} needs alpha in [{grid[0]}, {grid[-1]}], got {alpha}")
+    log_x = np.log(np.maximum(r, 1e-300)/r_s)
+    return rho_s*r_s**3*np.exp(_log_mu(name, log_x, alpha))
+
+
+def rotation_curve(r, components, central_mass=0.0):
+    """
+    Circular velocity of a sum of spherical components.
+
+    Args:
+        r (ndarray): radii in kpc (> 0).
+        components (list): (name, params) pairs, params being the keyword arguments of model_mass.
+        central_mass (float): point mass at the centre in Msun.
+
+    Returns:
+        ndarray: v_circ in km/s.
+    """
+    r = np.asarray(r, dtype=float)
+    M = np.full(r.shape, float(central_mass))
+    for name, params in components:
+        M += model_mass(name, r, **params)
+    return np.sqrt(G*M/r)
+
+
+# ==== Benchmark: accuracy, time per curve, and fitting many galaxies ====
+
+if __name__ == "__main__":
+    import argparse
+    from scipy.integrate import quad
+    from scipy.optimize import least_squares
+    from scipy.special import gamma, gammainc
+
+    parser = argparse.ArgumentParser(description="Tabulated rotation-curve models: accuracy and speed")
+    parser.add_argument("-ngal", type=int, default=1000, help="number of synthetic rotation curves to fit")
+    parser.add_argument("-nr", type=int, default=1000, help="radii per curve")
+    parser.add_argument("-rebuild", action="store_true", help="rebuild the cached tables")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    for name in PROFILES:
+        mass_table(name, rebuild=args.rebuild)
+        _spline(name)
+    print(f"tables ready in {time.perf_counter() - t0:.2f} s (cache: {CACHE_DIR})")
+
+    exact = {
+        'exponential': lambda x: 8*np.pi*gammainc(3, x),
+        'nfw': lambda x: 4*np.pi*(np.log1p(x) - x/(1 + x)),
+        'burkert': lambda x: np.pi*(np.log1p(x**2) + 2*np.log1p(x) - 2*np.arctan(x)),
+        'einasto': lambda x, a: (4*np.pi*np.exp(2/a)/a*(a/2)**(3/a)*gamma(3/a)*gammainc(3/a, 2/a*x**a)),
+    }
+    radii = np.linspace(0.1, 50, args.nr)
+    for name in PROFILES:
+        params = dict(rho_s=1e7, r_s=5.0)
+        shape = ()
+        if name == 'einasto':
+            params['alpha'] = 0.17
+            shape = (0.17,)
+        M = model_mass(name, radii, **params)
+        M_exact = 1e7*5.0**3*exact[name](radii/5.0, *shape)
+        t0 = time.perf_counter()
+        for _ in range(100):
+            model_mass(name, radii, **params)
+        t_table = (time.perf_counter() - t0)/100
+        f = PROFILES[name]
+        t0 = time.perf_counter()
+        for r in radii[:100]:
+            quad(lambda x: 4*np.pi*x**2*1e7*f(x/5.0, *shape), 0, r)
+        t_quad = (time.perf_counter() - t0)*args.nr/100
+        print(f"{name:>11s}: {args.nr} radii in {t_table*1e6:.0f} us (quad per radius {t_quad*1e3:.0f} ms),"
+              f" max rel err {np.max(np.abs(M/M_exact - 1)):.1e}")
+
+    # fit disk + NFW halo (rho_s, r_s of each) to noisy synthetic curves
+    rng = np.random.default_rng(1)
+    r_obs = np.linspace(1, 30, 40)
+    truth = np.column_stack((rng.uniform(5e6, 2e7, args.ngal), rng.uniform(2, 4, args.ngal),
+                             rng.uniform(1e6, 1e7, args.ngal), rng.uniform(10, 30, args.ngal)))
+
+    def model(p, r):
+        return rotation_curve(r, [('exponential', dict(rho_s=10**p[0], r_s=p[1])),
+                                  ('nfw', dict(rho_s=10**p[2], r_s=p[3]))], central_mass=4e6)
+
+    t0 = time.perf_counter()
+    n_eval = 0
+    fitted = np.empty_like(truth)
+    for i, (rd, sd, rh, sh) in enumerate(truth):
+        p_true = np.array([np.log10(rd), sd, np.log10(rh), sh])
+        v_obs = model(p_true, r_obs)*(1 + 0.01*rng.standard_normal(r_obs.size))
+        sol = least_squares(lambda p: (model(p, r_obs) - v_obs)/(0.01*v_obs), [7, 3, 6.5, 20],
+                            bounds=([5, 0.5, 4, 2], [9, 10, 9, 100]))
+        fitted[i] = sol.x
+        n_eval += sol.nfev
+    t_fit = time.perf_counter() - t0
+    print(f"fitted {args.ngal} rotation curves in {t_fit:.1f} s ({t_fit/args.ngal*1e3:.1f} ms per galaxy,"
+          f" {t_fit/n_eval*1e6:.0f} us per model evaluation incl. least_squares),"
+          f" median |log10 rho_disk error| {np.median(np.abs(fitted[:, 0] - np.log10(truth[:, 0]))):.3f}")
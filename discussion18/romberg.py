@@ -0,0 +1,171 @@
+'''
+Nested-grid integration: trapezoid, Simpson and Romberg estimates from one set of samples.
+
+Refining n_samples in demo0_numerical_integration.py evaluates f again at every point.
+If the number of intervals is doubled instead, every old sample is still a grid point,
+so each refinement only evaluates f at the new midpoints:
+
+    T_k = T_{k-1}/2 + h_k * sum(f(new midpoints)),   h_k = (b - a)/2^k
+
+From the same trapezoid sums, Richardson extrapolation gives Simpson's rule
+S_k = (4 T_k - T_{k-1})/3 and the higher Romberg columns
+R[k, j] = R[k, j-1] + (R[k, j-1] - R[k-1, j-1])/(4^j - 1).
+NestedQuadrature keeps all samples, so refining further (or asking for a tighter
+tolerance later) never repeats an evaluation of f. That matters for expensive
+integrands such as a model spectrum.
+
+Romberg converges very fast for smooth integrands. For kinks, singular endpoints or
+tabulated data use the trapezoid/Simpson estimates (or quad).
+
+Example:
+    res = romberg(lambda lam: B_lambda(lam, 5800), 400e-9, 700e-9, rtol=1e-10)
+    print(res.value, res.error, res.nfev, res.trapezoid, res.simpson)
+'''
+import time
+from types import SimpleNamespace
+import numpy as np
+
+
+class NestedQuadrature:
+    """
+    Samples of f on [a, b] at 2^k + 1 equally spaced points, refined by doubling.
+
+    Attributes:
+        x (ndarray): sample points in increasing order.
+        y (ndarray): f(x).
+        nfev (int): number of function evaluations so far.
+        trapezoid (list): trapezoid estimates T_0, T_1, ... (1, 2, 4, ... intervals).
+        table (list): Romberg table; table[k][j] uses levels k-j..k and has error O(h_k^(2j+2)).
+    """
+
+    def __init__(self, f, a, b, args=(), vectorized=True):
+        """
+        Args:
+            f (callable): f(x, *args).
+            a, b (float): integration limits.
+            args (tuple): extra arguments for f.
+            vectorized (bool): f accepts an array of points; otherwise it is called point by point.
+        """
+        self.f, self.a, self.b, self.args = f, float(a), float(b), args
+        self.vectorized = vectorized
+        self.nfev = 0
+        self._levels = [self._eval(np.array([self.a, self.b]))]  # new samples added at each level
+        self.trapezoid = [(self.b - self.a)/2*np.sum(self._levels[0])]
+        self.table = [[self.trapezoid[0]]]
+
+    def _eval(self, x):
+        self.nfev += x.size
+        if self.vectorized:
+            return np.asarray(self.f(x, *self.args), dtype=float)
+        return np.array([self.f(xi, *self.args) for xi in x], dtype=float)
+
+    @property
+    def level(self):
+        return len(self.trapezoid) - 1
+
+    def refine(self):
+        """Halves the spacing: evaluates f at the 2^(k-1) new midpoints only."""
+        k = self.level + 1
+        h = (self.b - self.a)/2**k
+        new = self._eval(self.a + h*np.arange(1, 2**k, 2))
+        self._levels.append(new)
+        self.trapezoid.append(self.trapezoid[-1]/2 + h*np.sum(new))
+        row = [self.trapezoid[-1]]
+        for j, prev in enumerate(self.table[-1], start=1):
+            row.append(row[-1] + (row[-1] - prev)/(4**j - 1))
+        self.table.append(row)
+
+    @property
+    def simpson(self):
+        return [row[1] for row in self.table[1:]]
+
+    @property
+    def x(self):
+        return np.linspace(self.a, self.b, 2**self.level + 1)
+
+    @property
+    def y(self):
+        # interleave the levels back into grid order
+        y = np.empty(2**self.level + 1)
+        y[[0, -1]] = self._levels[0]
+        for k, new in enumerate(self._levels[1:], start=1):
+            y[2**(self.level - k)::2**(self.level - k + 1)] = new
+        return y
+
+    def integrate(self, rtol=1e-10, atol=0.0, max_level=20, min_level=3):
+        """
+        Refines until successive diagonal Romberg estimates agree to max(atol, rtol*|I|).
+
+        Returns:
+            SimpleNamespace: value, error (difference of the last two diagonal estimates),
+                converged, nfev, level, and the latest trapezoid and Simpson estimates.
+        """
+        while True:
+            if self.level >= max(min_level, 1):
+                value, prev = self.table[-1][-1], self.table[-2][-1]
+                error = abs(value - prev)
+                converged = error <= max(atol, rtol*abs(value))
+                if converged or self.level >= max_level:
+                    return SimpleNamespace(value=value, error=error, converged=converged, nfev=self.nfev,
+                                           level=self.level, trapezoid=self.trapezoid[-1], simpson=self.simpson[-1])
+            self.refine()
+
+
+def romberg(f, a, b, args=(), rtol=1e-10, atol=0.0, max_level=20, vectorized=True):
+    """
+    Romberg integration of f over [a, b] (see NestedQuadrature.integrate).
+    The result also carries the trapezoid and Simpson estimates of the finest grid.
+    """
+    return NestedQuadrature(f, a, b, args=args, vectorized=vectorized).integrate(rtol=rtol, atol=atol,
+                                                                                 max_level=max_level)
+
+
+# ==== Benchmark: evaluations needed against refining from scratch ====
+
+if __name__ == "__main__":
+    import argparse
+    from scipy.integrate import quad, trapezoid, simpson
+
+    parser = argparse.ArgumentParser(description="Nested trapezoid/Simpson/Romberg vs refining from scratch")
+    parser.add_argument("-cost", type=float, default=1e-4, help="seconds per (simulated expensive) evaluation")
+    parser.add_argument("-rtol", type=float, default=1e-10, help="requested relative tolerance")
+    args = parser.parse_args()
+
+    def B_lambda(lam, T):
+        h, c, k = 6.626e-34, 3e8, 1.381e-23
+        return (2*h*c**2)/(lam**5) / (np.exp(h*c/(lam*k*T)) - 1)
+
+    def expensive(lam, T):
+        # a model spectrum that costs args.cost per wavelength
+        time.sleep(args.cost*np.size(lam))
+        return B_lambda(lam, T)
+
+    a, b, T = 400e-9, 700e-9, 5800
+    exact = quad(B_lambda, a, b, args=(T,), epsabs=0, epsrel=1e-13)[0]
+
+    # what refining n_samples by hand costs: every grid evaluated from scratch
+    nfev = 0
+    t0 = time.perf_counter()
+    for k in range(1, 21):
+        x = np.linspace(a, b, 2**k + 1)
+        y = expensive(x, T)
+        nfev += x.size
+        if abs(simpson(y, x=x)/exact - 1) < args.rtol:
+            break
+    t_scratch = time.perf_counter() - t0
+    print(f"Simpson from scratch: {2**k + 1} points, {nfev} evaluations, {t_scratch:.2f} s,"
+          f" rel err {abs(simpson(y, x=x)/exact - 1):.1e}")
+
+    t0 = time.perf_counter()
+    res = romberg(expensive, a, b, args=(T,), rtol=args.rtol)
+    t_romberg = time.perf_counter() - t0
+    print(f"nested Romberg: {res.nfev} evaluations (level {res.level}), {t_romberg:.2f} s,"
+          f" rel err {abs(res.value/exact - 1):.1e} (estimate {res.error/abs(res.value):.1e}) |"
+          f" same samples: trapezoid {abs(res.trapezoid/exact - 1):.1e}, Simpson {abs(res.simpson/exact - 1):.1e}")
+
+    # the samples are kept, so the trapezoid/Simpson columns agree with scipy on the same grid
+    nq = NestedQuadrature(B_lambda, a, b, args=(T,))
+    for _ in range(6):
+        nq.refine()
+    print(f"64 intervals: trapezoid {nq.trapezoid[-1]:.10e} (scipy {trapezoid(nq.y, x=nq.x):.10e}),"
+          f" Simpson {nq.simpson[-1]:.10e} (scipy {simpson(nq.y, x=nq.x):.10e}), {nq.nfev} evaluations")
@@ -0,0 +1,182 @@
+'''
+Checkpoint/restart for the long time-stepping loops (demo3/4/5, the batched pushers).
+
+A Checkpoint keeps the solver state (any number of named arrays plus the step counter
+and t) in a small memory-mapped .npy file with two slots. Saves alternate between the
+slots and a slot only becomes valid once its sequence number is written, after its data
+has been flushed, so a run killed in the middle of a save still has the previous slot.
+load_checkpoint() returns the newest valid slot, and the solver continues from there.
+
+Saving is a memcpy into the page cache plus an msync, but to keep it cheap no matter how
+fast the step is, maybe_save() only saves when at least `interval` seconds have passed
+and when the time since the last save is at least cost/max_fraction, where cost is the
+measured duration of the last save. Checkpointing therefore never takes more than about
+max_fraction of the wall time. maybe_save itself only reads the clock, but for steps of a
+few microseconds call it every few dozen steps rather than every step.
+
+Example:
+    ck = load_checkpoint('plate_ckpt.npy') if resume else None
+    if ck is not None:
+        step, t, temps = ck.step, ck.t, ck.arrays['temps']
+    checkpoint = Checkpoint('plate_ckpt.npy', interval=30)
+    while t < t_end:
+        ...  # advance temps by one step
+        checkpoint.maybe_save(step, t, temps=temps)
+'''
+import os
+import time
+from types import SimpleNamespace
+import numpy as np
+
+
+class Checkpoint:
+    """
+    Double-buffered, memory-mapped checkpoint file.
+
+    Attributes:
+        path (str): checkpoint .npy file.
+        n_saved (int): number of saves made by this object.
+        cost (float): wall time of the last save in seconds.
+        total_cost (float): wall time of all saves in seconds.
+    """
+
+    def __init__(self, path, interval=60.0, max_fraction=0.01):
+        """
+        Args:
+            path (str): checkpoint .npy file. An existing file with the same layout is reused,
+                so its last valid slot survives until the first new save has completed.
+            interval (float): minimum wall time between saves in maybe_save, in seconds.
+            max_fraction (float): upper bound on the fraction of wall time spent saving.
+        """
+        self.path = path
+        self.interval = interval
+        self.max_fraction = max_fraction
+        self.n_saved = 0
+        self.cost = 0.0
+        self.total_cost = 0.0
+        self._slots = None
+        self._seq = 0
+        self._last = time.perf_counter()
+
+    def _open(self, arrays):
+        dtype = np.dtype([('seq', np.int64), ('step', np.int64), ('t', np.float64)]
+                         + [(name, np.asarray(a).dtype, np.shape(a)) for name, a in arrays.items()])
+        if os.path.exists(self.path):
+            slots = np.load(self.path, mmap_mode='r+')
+            if slots.dtype == dtype and slots.shape == (2,):
+                self._slots = slots
+                self._seq = max(int(np.max(slots['seq'])), 0)
+                return
+            del slots
+        self._slots = np.lib.format.open_memmap(self.path, mode='w+', dtype=dtype, shape=(2,))
+        self._slots['seq'] = -1
+        self._seq = 0
+
+    def save(self, step, t, **arrays):
+        """Writes the state now, whatever the interval."""
+        t0 = time.perf_counter()
+        if self._slots is None:
+            self._open(arrays)
+        slots = self._slots
+        k = (self._seq + 1) % 2  # the older slot
+        slots['seq'][k] = -1
+        slots['step'][k] = step
+        slots['t'][k] = t
+        for name, a in arrays.items():
+            slots[name][k] = a
+        slots.flush()
+        self._seq += 1
+        slots['seq'][k] = self._seq
+        slots.flush()
+        self.n_saved += 1
+        self._last = time.perf_counter()
+        self.cost = self._last - t0
+        self.total_cost += self.cost
+
+    def maybe_save(self, step, t, **arrays):
+        """
+        Saves if enough time has passed since the last save; otherwise only reads the clock.
+
+        Returns:
+            bool: whether a checkpoint was written.
+        """
+        if time.perf_counter() - self._last < max(self.interval, self.cost/self.max_fraction):
+            return False
+        self.save(step, t, **arrays)
+        return True
+
+
+def load_checkpoint(path):
+    """
+    Reads the newest valid slot of a checkpoint file.
+
+    Returns:
+        SimpleNamespace or None: step, t and a dict of arrays (copies), or None if there is
+            no file or no complete checkpoint in it.
+    """
+    if not os.path.exists(path):
+        return None
+    slots = np.load(path, mmap_mode='r')
+    k = int(np.argmax(slots['seq']))
+    if slots['seq'][k] < 0:
+        return None
+    names = [name for name in slots.dtype.names if name not in ('seq', 'step', 't')]
+    return SimpleNamespace(step=int(slots['step'][k]), t=float(slots['t'][k]),
+                           arrays={name: np.array(slots[name][k]) for name in names})
+
+
+# ==== Benchmark: overhead and bit-exact restart on the 2D diffusion kernel ====
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    from diffusion_kernels import update_temps
+
+    parser = argparse.ArgumentParser(description="Checkpoint overhead and restart check for the 2D diffusion loop")
+    parser.add_argument("-sizes", type=int, nargs="+", default=[64, 256, 1024], help="plate sizes nx")
+    parser.add_argument("-seconds", type=float, default=2.0, help="wall time per run")
+    parser.add_argument("-interval", type=float, default=0.0,
+                        help="checkpoint interval in s (0: as often as max_fraction allows)")
+    parser.add_argument("-max_fraction", type=float, default=0.01, help="bound on the time spent checkpointing")
+    args = parser.parse_args()
+
+    def run(temps, nsteps, checkpoint=None, start=0):
+        T, newT = temps.copy(), temps.copy()
+        for step in range(start+1, nsteps+1):
+            update_temps(T, newT, 0.2)
+            T, newT = newT, T
+            # for steps of a few microseconds even the clock check is noticeable; look every 64 steps
+            if checkpoint is not None and step % 64 == 0:
+                checkpoint.maybe_save(step, step*0.1, temps=T)
+        return T
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for nx in args.sizes:
+            temps = 273*np.ones((nx, nx))
+            temps[:, -1] = 77.
+            run(temps, 2)  # compile
+            # steps that fit in the wall-time budget
+            t0 = time.perf_counter()
+            n = 1
+            while time.perf_counter() - t0 < args.seconds/10:
+                run(temps, n)
+                n *= 2
+            nsteps = int(n*10*args.seconds/(time.perf_counter() - t0) / 2) + 1
+
+            t0 = time.perf_counter()
+            plain = run(temps, nsteps)
+            t_plain = time.perf_counter() - t0
+
+            path = os.path.join(tmp, f'ck{nx}.npy')
+            ck = Checkpoint(path, interval=args.interval, max_fraction=args.max_fraction)
+            t0 = time.perf_counter()
+            run(temps, nsteps, checkpoint=ck)
+            t_ck = time.perf_counter() - t0
+
+            # restart from the last checkpoint, as if the run had died there
+            last = load_checkpoint(path)
+            resumed = run(last.arrays['temps'], nsteps, start=last.step)
+            print(f"{nx}x{nx}, {nsteps} steps: {ck.n_saved} checkpoints of {temps.nbytes/1e6:.2f} MB,"
+                  f" {ck.total_cost/ck.n_saved*1e3:.2f} ms each,"
+                  f" {ck.total_cost/t_ck:.2%} of the run (wall time {t_ck/t_plain - 1:+.1%}) |"
+                  f" resumed at step {last.step}: bit-identical {np.array_equal(resumed, plain)}")
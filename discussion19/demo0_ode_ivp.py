@@ -1,5 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from particle_pushers import make_batched_method
 
 # ==== Physical constants ====
 B_field = np.array([0, 0, 1])  # Magnetic field along Z (Tesla)
@@ -77,34 +78,48 @@ def rk4_method(q, m, r0, v0):
 
 # ==== Run Simulations ====
 
-methods = {
-    "Euler": euler_method,
-    "Euler-Cromer": euler_cromer_method,
-    "RK4": rk4_method,
-}
-
-# Store results for plotting
-results = {method: [] for method in methods}
-
-for method_name, method_func in methods.items():
-    for p in particles:
-        r_traj = method_func(p["q"], p["m"], p["r0"], p["v0"])
-        results[method_name].append((p["label"], r_traj, p["color"]))
-
-# ==== Plot XY Projections ====
-
-fig, axs = plt.subplots(1, 3, figsize=(18, 5))
-
-for ax, (method_name, particle_data) in zip(axs, results.items()):
-    for label, r, color in particle_data:
-        ax.plot(r[:, 0], r[:, 1], label=label, color=color, lw=1)
-    ax.set_title(f"{method_name} Method")
-    ax.set_xlabel("X position (m)")
-    ax.set_ylabel("Y position (m)")
-    ax.set_aspect('equal')
-    ax.grid(True)
-    ax.legend()
-
-plt.suptitle("Cyclotron Motion (XY Projection)", fontsize=16)
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+if __name__ == "__main__":
+    methods = {
+        "Euler": euler_method,
+        "Euler-Cromer": euler_cromer_method,
+        "RK4": rk4_method,
+    }
+    # all particles advanced together in one (N, 3) state with a single call; see particle_pushers.py
+    batched_methods = {
+        "RK4 (batched)": make_batched_method("rk4", dt, steps, B_field),
+    }
+
+    # Store results for plotting
+    results = {method: [] for method in (*methods, *batched_methods)}
+
+    for method_name, method_func in methods.items():
+        for p in particles:
+            r_traj = method_func(p["q"], p["m"], p["r0"], p["v0"])
+            results[method_name].append((p["label"], r_traj, p["color"]))
+
+    q = np.array([p["q"] for p in particles])
+    m = np.array([p["m"] for p in particles])
+    r0 = np.array([p["r0"] for p in particles])
+    v0 = np.array([p["v0"] for p in particles])
+    for method_name, method_func in batched_methods.items():
+        r_all = method_func(q, m, r0, v0)  # (steps, N, 3)
+        for i, p in enumerate(particles):
+            results[method_name].append((p["label"], r_all[:, i], p["color"]))
+
+    # ==== Plot XY Projections ====
+
+    fig, axs = plt.subplots(1, len(results), figsize=(6*len(results), 5))
+
+    for ax, (method_name, particle_data) in zip(axs, results.items()):
+        for label, r, color in particle_data:
+            ax.plot(r[:, 0], r[:, 1], label=label, color=color, lw=1)
+        ax.set_title(f"{method_name} Method")
+        ax.set_xlabel("X position (m)")
+        ax.set_ylabel("Y position (m)")
+        ax.set_aspect('equal')
+        ax.grid(True)
+        ax.legend()
+
+    plt.suptitle("Cyclotron Motion (XY Projection)", fontsize=16)
+    plt.tight_layout()
+    plt.show()
\ No newline at end of file
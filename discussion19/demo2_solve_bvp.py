@@ -46,24 +46,13 @@ plt.show()
 # so the matrix A have diagonal elements 2 - h^2, and -1 on upper and lower diagonals
 # and the right-hand side vector b is zero except for the last element which is 1 (from boundary condition y(b)=1)
 
-A = np.zeros((N-1, N-1))
-bvec = np.zeros(N-1)
-
-for i in range(N-1):
-    xi = x[i+1]
-    bvec[i] = 0 
-    if i > 0:
-        A[i,i-1] = -1 # lower diag
-    A[i,i] = 2 - h**2  # main diag
-    if i < N-2:
-        A[i,i+1] = -1  # upper diag
-
-# boundary conditions y(0)=0, y(pi/2)=1
-bvec[-1] = 1  # only last equation sees y_N
-
-# solve
-y_interior = np.linalg.solve(A, bvec)
-y = np.concatenate(([0], y_interior, [1]))
+# The matrix is tridiagonal, so we never build the dense (N-1) x (N-1) matrix:
+# fd_bvp.py assembles the three diagonals directly in banded form and solves in O(N),
+# which also works for millions of grid points.
+# Here p = 0, q = 1 and r = 0 in y'' + p y' + q y = r.
+from fd_bvp import solve_linear_bvp_fd
+
+x, y = solve_linear_bvp_fd(0, 1, 0, a, b, 0, 1, N)
 
 fig, ax = plt.subplots(figsize=(8,6))
 ax.plot(x, y, label="Finite difference solution")
@@ -1,6 +1,16 @@
+import argparse
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+from wave_solver import WaveSolver, animate
+from checkpoint import Checkpoint, load_checkpoint
+
+# With -checkpoint wave_ckpt.npy the damped run saves u, u_prev, the step and t every
+# -checkpoint_interval seconds; add -resume to continue a run from its last checkpoint.
+parser = argparse.ArgumentParser(description="Damped and undamped 1D waves")
+parser.add_argument("-checkpoint", type=str, default=None, help="save restart checkpoints to this .npy file")
+parser.add_argument("-checkpoint_interval", type=float, default=60., help="seconds between checkpoints")
+parser.add_argument("-resume", action="store_true", help="continue from the latest checkpoint")
+args = parser.parse_args()
 
 # damped wave equation
 
@@ -30,18 +40,23 @@ u = np.sin(np.pi * x)
 u_prev = u.copy()  # zero initial velocity
 
 # for each time steps
-for n in range(steps):
-    u_new = np.empty_like(u)
-    u_new[1:-1] = (
-        (2*u[1:-1] - u_prev[1:-1] * (1 - gamma*dt)
-        + (c*dt/dx)**2 * (u[2:] - 2*u[1:-1] + u[:-2]))
-        / (1 + gamma*dt)
-    )
-
-    u_new[0] = 0
-    u_new[-1] = 0
-
-    u_prev, u = u, u_new
+# WaveSolver (wave_solver.py) applies exactly this update, but keeps u_prev, u and u_new
+# in one preallocated ring buffer and overwrites the oldest level in place,
+# so no new array is allocated per step. It also works in 2D and 3D.
+last = load_checkpoint(args.checkpoint) if args.resume and args.checkpoint else None
+if last is not None:
+    u, u_prev = last.arrays['u'], last.arrays['u_prev']
+solver = WaveSolver(u, c, dx, dt, gamma=gamma, u_prev=u_prev)
+if last is not None:
+    solver.nstep, solver.t = last.step, last.t
+    print(f"Resuming at step {solver.nstep}, t = {solver.t:.3f}")
+checkpoint = Checkpoint(args.checkpoint, interval=args.checkpoint_interval) if args.checkpoint else None
+while solver.nstep < steps:
+    u = solver.step()
+    if checkpoint is not None:
+        checkpoint.maybe_save(solver.nstep, solver.t, u=solver.u, u_prev=solver.u_prev)
+if checkpoint is not None:
+    checkpoint.save(solver.nstep, solver.t, u=solver.u, u_prev=solver.u_prev)
 
 plt.plot(x, u)
 plt.title("Damped Wave After t = {:.2f}".format(steps*dt))
@@ -64,19 +79,10 @@ x = np.linspace(0, L, N)
 u = np.exp(-300*(x-0.3)**2)
 u_prev = u.copy()
 
-fig, ax = plt.subplots()
-line, = ax.plot(x, u)
-
-def update(frame):
-    global u, u_prev
-    un = np.empty_like(u)
-    un[1:-1] = (2*u[1:-1] - u_prev[1:-1] 
-                + (c*dt/dx)**2*(u[2:]-2*u[1:-1]+u[:-2]))
-    un[0] = un[-1] = 0
-    u_prev, u = u, un
-    line.set_ydata(u)
-    return line,
-
-anim = FuncAnimation(fig, update, frames=600, interval=20)
+# each frame does
+#   un[1:-1] = 2*u[1:-1] - u_prev[1:-1] + (c*dt/dx)**2*(u[2:]-2*u[1:-1]+u[:-2])
+# in place in the solver's ring buffer, and only the line is redrawn (blitting)
+solver = WaveSolver(u, c, dx, dt, u_prev=u_prev)
+anim = animate(solver, frames=600, interval=20, x=x)
 plt.show()
 
@@ -1,3 +1,10 @@
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+from snapshots import SnapshotWriter
+from checkpoint import Checkpoint, load_checkpoint
+from steady_state import solve_steady_state
+
 # Consider the diffusion equation:
 # partial x/partial t = d*laplace x.
 # Let's say we have a 273 K rod tha we're going to use as a 
@@ -5,6 +12,23 @@
 # The thermal diffusivity of copper is 1.16. 
 # Let's solve the 1D diffusion equation using explicit finite difference method.
 
+# Drawing every step is much slower than the step itself. For long runs use
+#   python demo4_1d_diffusion.py -headless -snapshots rod.npy
+# and make the animation afterwards with
+#   python snapshots.py rod.npy -outfile rod.gif
+# With -checkpoint rod_ckpt.npy the state is saved every -checkpoint_interval seconds,
+# and a run that died can be continued with the same command plus -resume.
+parser = argparse.ArgumentParser(description="1D diffusion along a copper rod")
+parser.add_argument("-headless", action="store_true", help="do not draw the live plot")
+parser.add_argument("-snapshots", type=str, default=None, help="store frames in this .npy file")
+parser.add_argument("-stride", type=int, default=10, help="store every stride-th step")
+parser.add_argument("-steady", action="store_true",
+                    help="skip the time evolution and solve for the equilibrium directly (multigrid)")
+parser.add_argument("-checkpoint", type=str, default=None, help="save restart checkpoints to this .npy file")
+parser.add_argument("-checkpoint_interval", type=float, default=60., help="seconds between checkpoints")
+parser.add_argument("-resume", action="store_true", help="continue from the latest checkpoint")
+args = parser.parse_args()
+
 nt = 1000
 nx = 20
 tpts = np.linspace(0,100,num=nt)
@@ -21,21 +45,61 @@ temps = 273*np.ones(nx)
 temps[-1] = 77.
 newtemps = np.copy(temps)
 
-# Let's animate this
-plt.ion()
-plt.plot(xpts, temps)
-
-# Loop through times and update
-t = 0
-while t < 120:
-    for x in range(1, nx-1):
-        newtemps[x] = (1-2*r*diff)*temps[x] + r*diff*(temps[x-1]+temps[x+1])
-    temps = np.copy(newtemps)
-    t+=dt
-
+if args.steady:
+    # At equilibrium dT/dt = 0, so we can solve laplace T = 0 with the same fixed ends
+    # instead of marching in time until Delta is small (see steady_state.py)
+    temps, info = solve_steady_state(temps, method='multigrid', tol=1e-10)
+    print(f"Equilibrium after {info['cycles']} V-cycles in {info['time']:.4f} s")
     plt.plot(xpts, temps)
     plt.ylim(bottom=50,top=300)
-    plt.title('Time = '+ str(np.round(t,3)))
-    plt.draw()
-    plt.pause(0.001)
-    plt.clf()
\ No newline at end of file
+    plt.title('Equilibrium')
+    plt.show()
+else:
+    t_end = 120
+    t = 0
+    step = 0
+    last = load_checkpoint(args.checkpoint) if args.resume and args.checkpoint else None
+    if last is not None:
+        step, t, temps = last.step, last.t, last.arrays['temps']
+        newtemps = np.copy(temps)
+        print(f"Resuming at step {step}, t = {t:.3f}")
+    checkpoint = Checkpoint(args.checkpoint, interval=args.checkpoint_interval) if args.checkpoint else None
+
+    writer = None
+    if args.snapshots:
+        # one spare step in case the floating-point t needs it to pass t_end
+        writer = SnapshotWriter(args.snapshots, temps.shape, int(np.ceil(t_end/dt)) + 1, stride=args.stride,
+                                resume=last is not None)
+        writer.write(step, t, temps)
+
+    # Let's animate this
+    if not args.headless:
+        plt.ion()
+        plt.plot(xpts, temps)
+
+    # Loop through times and update
+    while t < t_end:
+        for x in range(1, nx-1):
+            newtemps[x] = (1-2*r*diff)*temps[x] + r*diff*(temps[x-1]+temps[x+1])
+        temps = np.copy(newtemps)
+        t+=dt
+        step += 1
+        if writer is not None:
+            writer.write(step, t, temps)
+        if checkpoint is not None:
+            checkpoint.maybe_save(step, t, temps=temps)
+        if args.headless:
+            continue
+
+        plt.plot(xpts, temps)
+        plt.ylim(bottom=50,top=300)
+        plt.title('Time = '+ str(np.round(t,3)))
+        plt.draw()
+        plt.pause(0.001)
+        plt.clf()
+
+    if writer is not None:
+        writer.close()
+        print(f"Stored {writer.n_written} frames in {args.snapshots}")
+    if checkpoint is not None:
+        checkpoint.save(step, t, temps=temps)
@@ -1,6 +1,10 @@
+import argparse
 import numpy as np
 import matplotlib.pyplot as plt
-from numba import jit
+from diffusion_kernels import update_temps
+from snapshots import SnapshotWriter
+from checkpoint import Checkpoint, load_checkpoint
+from steady_state import solve_steady_state
 import sys
 
 # Now we are solving the 2D diffusion equation
@@ -9,52 +13,139 @@ import sys
 # Again, we have a 273 K plate that we're going to use as a 
 # thermal conductor to get heat out of a 70 K cryogenic dewar.
 # The thermal diffusivity of copper is 1.16.   
+# The update kernel lives in diffusion_kernels.py: it runs in parallel over rows,
+# writes into a preallocated second buffer and returns the convergence delta.
 
+# Drawing every step is much slower than the step itself. For long runs use
+#   python demo5_2d_diffusion.py -headless -snapshots plate.npy
+# and make the animation afterwards with
+#   python snapshots.py plate.npy -outfile plate.gif
+# With -checkpoint plate_ckpt.npy the state is saved every -checkpoint_interval seconds,
+# and a run that died can be continued with the same command plus -resume.
+# -workers 4 splits the rows of the plate over 4 processes (diffusion_parallel.py). That only
+# pays off for large plates; the workers are started with 'spawn' and import this file again,
+# hence the __main__ guard.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="2D diffusion on a copper plate")
+    parser.add_argument("-headless", action="store_true", help="do not draw the live plot")
+    parser.add_argument("-snapshots", type=str, default=None, help="store frames in this .npy file")
+    parser.add_argument("-stride", type=int, default=100, help="store every stride-th step")
+    parser.add_argument("-steady", action="store_true",
+                        help="skip the time evolution and solve for the equilibrium directly (multigrid)")
+    parser.add_argument("-checkpoint", type=str, default=None, help="save restart checkpoints to this .npy file")
+    parser.add_argument("-checkpoint_interval", type=float, default=60., help="seconds between checkpoints")
+    parser.add_argument("-resume", action="store_true", help="continue from the latest checkpoint")
+    parser.add_argument("-workers", type=int, default=1, help="split the plate over this many worker processes")
+    args = parser.parse_args()
 
-@jit(nopython=True)
-def update_temps(temps,nx):
-	newtemps = np.copy(temps)
-	for x in range(1, nx-1):
-		for y in range(1,nx-1):
-			newtemps[y,x] = (1-4*r*diff)*temps[y,x] + r*diff*(temps[y,x-1]+temps[y,x+1] +temps[y-1,x]+temps[y+1,x] )
-	return newtemps
-
-
-nt = 5000
-nx = 20
-tpts = np.linspace(0,1,num=nt)
-dt = tpts[1]-tpts[0]
-xpts = np.linspace(0,1., num=nx)
-dx = xpts[1] - xpts[0]
-
-r = dt/dx**2
-diff = 1.16
-# Note that stability requirement is stricter in 2D
-print(diff*r)
-
-# Make temperature grid with inital conditions
-temps = 273*np.ones((nx,nx))
-temps[:,-1] = 77.
-newtemps = np.copy(temps)
-
-plt.imshow(temps)
-plt.show()
-# Let's animate this
-plt.ion()
-plt.plot(xpts, temps)
-# Loop through times and update
-t=0
-while t < 200:
-    newtemps = update_temps(temps, nx)
-    txt = 'Delta: ' + str(np.round(np.sum(np.abs(temps-newtemps)),3))
-    sys.stdout.write(txt+'\r')
-    sys.stdout.flush()
-    temps = np.copy(newtemps)
-    t+=dt
-
-    plt.imshow(temps,origin='lower')
-    # plt.ylim(bottom=50,top=300)
-    plt.title('Time = '+ str(np.round(t,3)))
-    plt.draw()
-    plt.pause(0.0001)
-    plt.clf()
\ No newline at end of file
+    nt = 5000
+    nx = 20
+    tpts = np.linspace(0,1,num=nt)
+    dt = tpts[1]-tpts[0]
+    xpts = np.linspace(0,1., num=nx)
+    dx = xpts[1] - xpts[0]
+
+    r = dt/dx**2
+    diff = 1.16
+    # Note that stability requirement is stricter in 2D
+    print(diff*r)
+
+    # Make temperature grid with inital conditions
+    temps = 273*np.ones((nx,nx))
+    temps[:,-1] = 77.
+    newtemps = np.copy(temps)  # second buffer for the ping-pong update, edges stay fixed
+
+    if args.steady:
+        # At equilibrium dT/dt = 0, so we can solve laplace T = 0 with the same fixed ends
+        # instead of marching in time until Delta is small (see steady_state.py)
+        temps, info = solve_steady_state(temps, method='multigrid', tol=1e-10)
+        print(f"Equilibrium after {info['cycles']} V-cycles in {info['time']:.4f} s")
+        plt.imshow(temps,origin='lower')
+        plt.title('Equilibrium')
+        plt.show()
+    else:
+        t_end = 200
+        t = 0
+        step = 0
+        last = load_checkpoint(args.checkpoint) if args.resume and args.checkpoint else None
+        if last is not None:
+            step, t, temps = last.step, last.t, last.arrays['temps']
+            newtemps = np.copy(temps)
+            print(f"Resuming at step {step}, t = {t:.3f}")
+        checkpoint = Checkpoint(args.checkpoint, interval=args.checkpoint_interval) if args.checkpoint else None
+
+        writer = None
+        if args.snapshots:
+            # one spare step in case the floating-point t needs it to pass t_end
+            writer = SnapshotWriter(args.snapshots, temps.shape, int(np.ceil(t_end/dt)) + 1, stride=args.stride,
+                                    resume=last is not None)
+            writer.write(step, t, temps)
+
+        if not args.headless:
+            plt.imshow(temps)
+            plt.show()
+            # Let's animate this
+            plt.ion()
+            plt.plot(xpts, temps)
+
+        def report(step, t, temps, delta, draw=True):
+            # snapshot, checkpoint and progress of one finished step
+            if writer is not None:
+                writer.write(step, t, temps)
+            if checkpoint is not None:
+                checkpoint.maybe_save(step, t, temps=temps)
+            if args.headless or not draw:
+                if step % args.stride == 0:
+                    sys.stdout.write('Delta: ' + str(np.round(delta,3)) + '\r')
+                    sys.stdout.flush()
+                return
+
+            txt = 'Delta: ' + str(np.round(delta,3))
+            sys.stdout.write(txt+'\r')
+            sys.stdout.flush()
+
+            plt.imshow(temps,origin='lower')
+            # plt.ylim(bottom=50,top=300)
+            plt.title('Time = '+ str(np.round(t,3)))
+            plt.draw()
+            plt.pause(0.0001)
+            plt.clf()
+
+        # With -workers the rows are split over worker processes (diffusion_parallel.py). The
+        # workers only hand the grid back every stride steps, so the snapshots, checkpoints and
+        # the plot happen at those steps; first a few serial steps line the run up with the stride.
+        parallel = args.workers > 1
+        # Loop through times and update
+        while t < t_end and not (parallel and step % args.stride == 0):
+            delta = update_temps(temps, newtemps, r*diff)
+            temps, newtemps = newtemps, temps  # swap buffers instead of copying
+            t+=dt
+            step += 1
+            report(step, t, temps, delta, draw=not parallel)
+
+        if parallel and t < t_end:
+            from diffusion_parallel import run_parallel
+            # as many steps as the serial loop would take, t being accumulated the same way
+            nsteps, t_stop = 0, t
+            while t_stop < t_end:
+                t_stop += dt
+                nsteps += 1
+            step0, clock = step, [0, t]  # steps and time accumulated so far, for on_sync
+
+            def on_sync(n, temps, delta):
+                while clock[0] < n:
+                    clock[0] += 1
+                    clock[1] += dt
+                report(step0 + n, clock[1], temps, delta)
+
+            temps, delta = run_parallel(temps, r*diff, nsteps, workers=args.workers, sync_every=args.stride,
+                                        on_sync=on_sync)
+            step, t = step0 + nsteps, t_stop
+            if writer is not None:
+                writer.write(step, t, temps)
+
+        if writer is not None:
+            writer.close()
+            print(f"\nStored {writer.n_written} frames in {args.snapshots}")
+        if checkpoint is not None:
+            checkpoint.save(step, t, temps=temps)
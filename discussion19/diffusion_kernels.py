@@ -0,0 +1,110 @@
+'''
+Parallel, allocation-free numba kernel for the explicit 2D diffusion update.
+
+The update_temps in the original demo5_2d_diffusion.py read r and diff as globals,
+made a fresh np.copy(temps) every call and ran on one core; the driver then copied
+the result again and made another pass for np.sum(np.abs(temps-newtemps)).
+Here the kernel
+- writes into a second, preallocated buffer (the caller swaps the two: "ping-pong"),
+- splits the rows over all cores with prange,
+- returns the convergence delta sum(|new - old|) computed in the same pass.
+
+Example:
+    newtemps = temps.copy()  # second buffer; the fixed edges are never written
+    for step in range(nsteps):
+        delta = update_temps(temps, newtemps, r*diff)
+        temps, newtemps = newtemps, temps
+'''
+import time
+import numpy as np
+from numba import njit, prange
+
+
+@njit(parallel=True)
+def update_temps(temps, newtemps, coef):
+    """
+    One explicit step of the 2D diffusion equation on the interior of temps.
+
+    Args:
+        temps (ndarray): current temperatures, shape (ny, nx). Not modified.
+        newtemps (ndarray): output buffer of the same shape; its edges are left untouched.
+        coef (float): r*diff = diff*dt/dx^2, must be < 0.25 for stability.
+
+    Returns:
+        float: sum of |newtemps - temps| over the interior.
+    """
+    ny, nx = temps.shape
+    delta = 0.0
+    for y in prange(1, ny-1):
+        for x in range(1, nx-1):
+            new = (1-4*coef)*temps[y, x] + coef*(temps[y, x-1] + temps[y, x+1]
+                                                 + temps[y-1, x] + temps[y+1, x])
+            newtemps[y, x] = new
+            delta += abs(new - temps[y, x])
+    return delta
+
+
+@njit
+def update_temps_serial(temps, nx, coef):
+    # the original demo5 kernel (with the globals passed in), kept as the benchmark reference
+    newtemps = np.copy(temps)
+    for x in range(1, nx-1):
+        for y in range(1, nx-1):
+            newtemps[y, x] = (1-4*coef)*temps[y, x] + coef*(temps[y, x-1] + temps[y, x+1]
+                                                            + temps[y-1, x] + temps[y+1, x])
+    return newtemps
+
+
+def run_explicit(temps, coef, nsteps):
+    """
+    Advances temps by nsteps explicit steps with two ping-pong buffers.
+
+    Returns:
+        tuple: final temperatures and the delta of the last step.
+    """
+    temps = np.array(temps, dtype=float)
+    newtemps = temps.copy()
+    delta = 0.0
+    for _ in range(nsteps):
+        delta = update_temps(temps, newtemps, coef)
+        temps, newtemps = newtemps, temps
+    return temps, delta
+
+
+# ==== Benchmark: cells updated per second ====
+
+if __name__ == "__main__":
+    import argparse
+    import numba
+
+    parser = argparse.ArgumentParser(description="Cells/s of the parallel vs original diffusion kernel")
+    parser.add_argument("-sizes", type=int, nargs="+", default=[256, 1024, 4096], help="grid sizes nx")
+    parser.add_argument("-steps", type=int, default=20, help="steps per timing")
+    args = parser.parse_args()
+
+    coef = 0.2
+    print(f"numba threads: {numba.get_num_threads()}")
+    for nx in args.sizes:
+        temps = 273*np.ones((nx, nx))
+        temps[:, -1] = 77.
+        cells = (nx-2)**2 * args.steps
+
+        # warm up (compile) outside the timing
+        run_explicit(temps, coef, 1)
+        update_temps_serial(temps, nx, coef)
+
+        t0 = time.perf_counter()
+        T_old = temps.copy()
+        for _ in range(args.steps):
+            newtemps = update_temps_serial(T_old, nx, coef)
+            delta_old = np.sum(np.abs(T_old - newtemps))
+            T_old = np.copy(newtemps)
+        t_old = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        T_new, delta_new = run_explicit(temps, coef, args.steps)
+        t_new = time.perf_counter() - t0
+
+        print(f"{nx}x{nx}: original {cells/t_old:.3e} cells/s | parallel ping-pong {cells/t_new:.3e} cells/s"
+              f" | speedup {t_old/t_new:.1f}x | max |diff| = {np.max(np.abs(T_new - T_old)):.1e},"
+              f" delta {delta_new:.6g} vs {delta_old:.6g}")
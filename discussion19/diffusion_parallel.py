@@ -0,0 +1,179 @@
+'''
+Multi-process domain decomposition for the explicit 2D diffusion solver.
+
+The plate is split into horizontal strips of rows, one strip per worker process.
+Both ping-pong buffers live in multiprocessing.shared_memory, so every worker sees the
+whole grid without copying: the halo rows it needs from its neighbours (the row just
+above and just below its strip) are read straight from the shared buffer. A Barrier after
+every step makes sure all strips of step n are written before anyone starts step n+1.
+Nothing is pickled after start-up; only the segment names travel to the workers.
+Workers are started with 'spawn', since forking a parent that has already started
+numba's parallel thread pool (e.g. via update_temps) can hang it at exit.
+
+Each cell is updated with exactly the same expression as diffusion_kernels.update_temps,
+so the result is bit-identical to the serial solver for any number of workers.
+
+Example:
+    temps, delta = run_parallel(temps, coef=r*diff, nsteps=100000, workers=4)
+'''
+import time
+import threading
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def update_rows(temps, newtemps, coef, y0, y1):
+    # the update_temps stencil restricted to rows y0 <= y < y1, returning this strip's delta
+    nx = temps.shape[1]
+    delta = 0.0
+    for y in range(y0, y1):
+        for x in range(1, nx-1):
+            new = (1-4*coef)*temps[y, x] + coef*(temps[y, x-1] + temps[y, x+1]
+                                                 + temps[y-1, x] + temps[y+1, x])
+            newtemps[y, x] = new
+            delta += abs(new - temps[y, x])
+    return delta
+
+
+def split_rows(ny, workers):
+    # interior rows 1..ny-2 in nearly equal contiguous strips
+    edges = np.linspace(1, ny-1, workers+1).round().astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _worker(names, shape, coef, rows, nsteps, barrier, sync, sync_every, rank):
+    shms = [SharedMemory(name=name) for name in names]
+    try:
+        bufs = [np.ndarray(shape, dtype=np.float64, buffer=shm.buf) for shm in shms[:2]]
+        deltas = np.ndarray((barrier.parties,), dtype=np.float64, buffer=shms[2].buf)
+        y0, y1 = rows
+        for n in range(nsteps):
+            deltas[rank] = update_rows(bufs[n % 2], bufs[(n+1) % 2], coef, y0, y1)
+            barrier.wait()
+            if sync is not None and (n+1) % sync_every == 0:
+                sync.wait()  # parent may now read the finished step
+                sync.wait()  # parent is done reading
+    except BaseException:
+        # break the barriers, so the other workers and the parent fail instead of waiting forever
+        barrier.abort()
+        if sync is not None:
+            sync.abort()
+        raise
+    finally:
+        for shm in shms:
+            shm.close()
+
+
+def run_parallel(temps, coef, nsteps, workers=2, sync_every=0, on_sync=None, timeout=60.):
+    """
+    Runs nsteps explicit diffusion steps with the rows split over worker processes.
+
+    Args:
+        temps (ndarray): initial temperatures, shape (ny, nx); edges are held fixed.
+        coef (float): r*diff = diff*dt/dx^2 (< 0.25).
+        nsteps (int): number of steps.
+        workers (int): number of worker processes (strips).
+        sync_every (int): call on_sync every sync_every steps (0: never).
+        on_sync (callable, optional): on_sync(step, temps, delta) in the parent, e.g. to write snapshots.
+            temps is a view into shared memory and is only valid during the call.
+        timeout (float): seconds any process waits at a barrier (a step, or on_sync) before giving up.
+
+    Returns:
+        tuple: final temperatures and the delta sum(|new - old|) of the last step.
+
+    Raises:
+        RuntimeError: if a worker fails, dies or times out.
+    """
+    temps = np.asarray(temps, dtype=np.float64)
+    shape = temps.shape
+    workers = max(1, min(workers, shape[0] - 2))
+    shms = [SharedMemory(create=True, size=temps.nbytes) for _ in range(2)]
+    shms.append(SharedMemory(create=True, size=8*workers))
+    try:
+        bufs = [np.ndarray(shape, dtype=np.float64, buffer=shm.buf) for shm in shms[:2]]
+        bufs[0][:] = temps
+        bufs[1][:] = temps  # the fixed edges have to be in both buffers
+        deltas = np.ndarray((workers,), dtype=np.float64, buffer=shms[2].buf)
+        deltas[:] = 0
+
+        ctx = multiprocessing.get_context('spawn')
+        barrier = ctx.Barrier(workers, timeout=timeout)
+        sync = ctx.Barrier(workers + 1, timeout=timeout) if sync_every and on_sync is not None else None
+        names = [shm.name for shm in shms]
+        procs = [ctx.Process(target=_worker, args=(names, shape, coef, rows, nsteps, barrier, sync, sync_every, rank))
+                 for rank, rows in enumerate(split_rows(shape[0], workers))]
+        for p in procs:
+            p.start()
+        try:
+            if sync is not None:
+                for n in range(sync_every, nsteps+1, sync_every):
+                    sync.wait()
+                    on_sync(n, bufs[n % 2], float(np.sum(deltas)))
+                    sync.wait()
+        except threading.BrokenBarrierError:
+            for p in procs:
+                p.terminate()
+            raise RuntimeError("a diffusion worker process failed or timed out") from None
+        except BaseException:
+            # on_sync failed or the run was interrupted: release the workers, then re-raise
+            if sync is not None:
+                sync.abort()
+            for p in procs:
+                p.terminate()
+            raise
+        finally:
+            for p in procs:
+                p.join()
+        if any(p.exitcode != 0 for p in procs):
+            raise RuntimeError("a diffusion worker process failed")
+        return bufs[nsteps % 2].copy(), float(np.sum(deltas))
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+
+# ==== Strong/weak scaling benchmark ====
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    from diffusion_kernels import run_explicit
+
+    parser = argparse.ArgumentParser(description="Strong and weak scaling of the strip-decomposed diffusion solver")
+    parser.add_argument("-nx", type=int, default=2048, help="grid size for strong scaling")
+    parser.add_argument("-rows", type=int, default=512, help="rows per worker for weak scaling")
+    parser.add_argument("-steps", type=int, default=50, help="steps per run")
+    parser.add_argument("-max_workers", type=int, default=os.cpu_count(), help="largest number of workers")
+    args = parser.parse_args()
+
+    coef = 0.2
+    counts = [w for w in (1, 2, 4, 8, 16, 32, 64) if w <= args.max_workers] or [1]
+    update_rows(np.ones((3, 3)), np.ones((3, 3)), coef, 1, 2)  # compile and cache once, the spawned workers load it
+
+    # strong scaling: fixed grid, more workers
+    temps = 273*np.ones((args.nx, args.nx))
+    temps[:, -1] = 77.
+    serial, _ = run_explicit(temps, coef, args.steps)
+    t1 = None
+    for w in counts:
+        t0 = time.perf_counter()
+        result, delta = run_parallel(temps, coef, args.steps, workers=w)
+        t = time.perf_counter() - t0
+        t1 = t1 or t
+        print(f"strong {args.nx}x{args.nx}, {w:2d} workers: {t:.3f} s, speedup {t1/t:.2f},"
+              f" efficiency {t1/t/w:.2f}, bit-identical to serial: {np.array_equal(result, serial)}")
+
+    # weak scaling: args.rows rows per worker
+    t1 = None
+    for w in counts:
+        temps = 273*np.ones((args.rows*w + 2, args.nx))
+        temps[:, -1] = 77.
+        t0 = time.perf_counter()
+        run_parallel(temps, coef, args.steps, workers=w)
+        t = time.perf_counter() - t0
+        t1 = t1 or t
+        print(f"weak {args.rows} rows/worker, {w:2d} workers: {t:.3f} s, efficiency {t1/t:.2f}")
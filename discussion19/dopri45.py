@@ -0,0 +1,271 @@
+'''
+Adaptive Dormand-Prince RK5(4) integrator compiled with numba.
+
+solve_ivp calls the Python right-hand side thousands of times, and the ode() in
+discussion19_activity_solution.py builds a new array and calls np.cross each time.
+Here both the stepper and the right-hand side are compiled, and the right-hand side writes
+into a preallocated stage buffer instead of returning a new array.
+Output at t_eval comes from the 4th-order dense output polynomial (same one as scipy's RK45),
+so asking for many output times does not force the integrator to take tiny steps.
+
+A right-hand side has the signature rhs(t, y, params, out) and must be decorated with @njit.
+
+Example:
+    params = np.array([q/m, 0.0, 0.0, 1.0])  # q/m and B_field
+    sol = solve_dopri45(lorentz_rhs, (0, t_tot), np.concatenate((r0, v0)), params, t_eval=t_eval)
+    r = sol.y[:3].T
+'''
+import time
+from types import SimpleNamespace
+import numpy as np
+from numba import njit
+
+
+# ==== Dormand-Prince tableau ====
+
+C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1])
+A = np.array([
+    [0, 0, 0, 0, 0],
+    [1/5, 0, 0, 0, 0],
+    [3/40, 9/40, 0, 0, 0],
+    [44/45, -56/15, 32/9, 0, 0],
+    [19372/6561, -25360/2187, 64448/6561, -212/729, 0],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]])
+B = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84])
+# difference between the 5th and embedded 4th order solutions (last entry multiplies the FSAL stage)
+E = np.array([-71/57600, 0, 71/16695, -71/1920, 17253/339200, -22/525, 1/40])
+# coefficients of the quartic dense output, y(t + theta*h) = y + h * K^T P [theta, theta^2, theta^3, theta^4]
+P = np.array([
+    [1, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+    [0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+    [0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+    [0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+    [0, 40617522/29380423, -110615467/29380423, 69997945/29380423]])
+
+SAFETY = 0.9
+MIN_FACTOR = 0.2
+MAX_FACTOR = 10.0
+EPS = np.finfo(float).eps
+
+# status codes of _dopri45
+MESSAGES = {
+    0: "The solver successfully reached the end of the integration interval.",
+    1: "Maximum number of steps reached.",
+    2: "Required step size is less than spacing between numbers.",
+    3: "Error estimate is not finite (the right-hand side returned NaN or inf).",
+}
+
+
+# ==== Right-hand sides ====
+
+@njit
+def lorentz_rhs(t, y, params, out):
+    # y = (x, y, z, vx, vy, vz), params = (q/m, Bx, By, Bz); dv/dt = (q/m) v x B
+    qm, bx, by, bz = params[0], params[1], params[2], params[3]
+    out[0] = y[3]
+    out[1] = y[4]
+    out[2] = y[5]
+    out[3] = qm*(y[4]*bz - y[5]*by)
+    out[4] = qm*(y[5]*bx - y[3]*bz)
+    out[5] = qm*(y[3]*by - y[4]*bx)
+
+
+# ==== Compiled stepper ====
+
+@njit
+def _rms_norm(err, y, y_new, rtol, atol):
+    total = 0.0
+    for i in range(y.size):
+        scale = atol + rtol*max(abs(y[i]), abs(y_new[i]))
+        total += (err[i]/scale)**2
+    return np.sqrt(total/y.size)
+
+@njit
+def _initial_step(rhs, t0, y0, f0, params, direction, rtol, atol, y1, f1):
+    # Hairer, Norsett & Wanner (1993), Solving ODEs I, Sec. II.4
+    d0 = 0.0
+    d1 = 0.0
+    for i in range(y0.size):
+        scale = atol + rtol*abs(y0[i])
+        d0 += (y0[i]/scale)**2
+        d1 += (f0[i]/scale)**2
+    d0 = np.sqrt(d0/y0.size)
+    d1 = np.sqrt(d1/y0.size)
+    h0 = 1e-6 if (d0 < 1e-5 or d1 < 1e-5) else 0.01*d0/d1
+    for i in range(y0.size):
+        y1[i] = y0[i] + h0*direction*f0[i]
+    rhs(t0 + h0*direction, y1, params, f1)
+    d2 = 0.0
+    for i in range(y0.size):
+        scale = atol + rtol*abs(y0[i])
+        d2 += ((f1[i] - f0[i])/scale)**2
+    d2 = np.sqrt(d2/y0.size)/h0
+    if d1 <= 1e-15 and d2 <= 1e-15:
+        h1 = max(1e-6, h0*1e-3)
+    else:
+        h1 = (0.01/max(d1, d2))**(1/5)
+    return min(100*h0, h1)
+
+@njit
+def _dopri45(rhs, t0, t_end, y0, params, t_eval, rtol, atol, first_step, max_steps):
+    n = y0.size
+    direction = 1.0 if t_end >= t0 else -1.0
+    K = np.empty((7, n))  # stage derivatives; K[6] is f(t_new, y_new) and becomes K[0] of the next step
+    y = y0.copy()
+    y_new = np.empty(n)
+    y_stage = np.empty(n)
+    err = np.empty(n)
+    Q = np.empty((n, 4))
+    y_out = np.empty((t_eval.size, n))
+    nfev = 0
+    nstep = 0
+    nreject = 0
+
+    t = t0
+    rhs(t, y, params, K[0])
+    nfev += 1
+    if first_step > 0:
+        h = first_step
+    else:
+        h = _initial_step(rhs, t0, y, K[0], params, direction, rtol, atol, y_stage, K[1])
+        nfev += 1
+
+    i_eval = 0
+    while i_eval < t_eval.size and (t_eval[i_eval] - t0)*direction <= 0:
+        y_out[i_eval] = y
+        i_eval += 1
+
+    status = 0
+    while (t_end - t)*direction > 0:
+        if nstep >= max_steps:
+            status = 1
+            break
+        # like solve_ivp, give up once the step no longer moves t by more than rounding
+        min_step = 10*EPS*abs(t)
+        step_accepted = False
+        while not step_accepted:
+            if not h > min_step:
+                status = 2
+                break
+            last = h >= abs(t_end - t)
+            hs = (t_end - t) if last else h*direction
+            for s in range(1, 6):
+                for i in range(n):
+                    acc = 0.0
+                    for j in range(s):
+                        acc += A[s, j]*K[j, i]
+                    y_stage[i] = y[i] + hs*acc
+                rhs(t + C[s]*hs, y_stage, params, K[s])
+            for i in range(n):
+                acc = 0.0
+                for j in range(6):
+                    acc += B[j]*K[j, i]
+                y_new[i] = y[i] + hs*acc
+            rhs(t + hs, y_new, params, K[6])
+            nfev += 6
+            for i in range(n):
+                acc = 0.0
+                for j in range(7):
+                    acc += E[j]*K[j, i]
+                err[i] = hs*acc
+            err_norm = _rms_norm(err, y, y_new, rtol, atol)
+            if not np.isfinite(err_norm):
+                status = 3
+                break
+            if err_norm < 1:
+                factor = MAX_FACTOR if err_norm == 0 else min(MAX_FACTOR, SAFETY*err_norm**(-1/5))
+                step_accepted = True
+            else:
+                h *= max(MIN_FACTOR, SAFETY*err_norm**(-1/5))
+                nreject += 1
+        if status:
+            break
+        t_new = t_end if last else t + hs
+        nstep += 1
+
+        # dense output for every t_eval inside (t, t_new]
+        if i_eval < t_eval.size and (t_eval[i_eval] - t_new)*direction <= 0:
+            for i in range(n):
+                for k in range(4):
+                    acc = 0.0
+                    for j in range(7):
+                        acc += K[j, i]*P[j, k]
+                    Q[i, k] = acc
+            while i_eval < t_eval.size and (t_eval[i_eval] - t_new)*direction <= 0:
+                theta = (t_eval[i_eval] - t)/hs
+                for i in range(n):
+                    x = theta
+                    acc = 0.0
+                    for k in range(4):
+                        acc += Q[i, k]*x
+                        x *= theta
+                    y_out[i_eval, i] = y[i] + hs*acc
+                i_eval += 1
+
+        t = t_new
+        y[:] = y_new
+        K[0] = K[6]
+        h *= factor
+
+    return y_out, i_eval, t, nfev, nstep, nreject, status
+
+
+# ==== Python entry point ====
+
+def solve_dopri45(rhs, t_span, y0, params, t_eval=None, rtol=1e-6, atol=1e-9, first_step=None,
+                  max_steps=10**7):
+    """
+    Integrates y' = rhs(t, y) with the adaptive Dormand-Prince RK5(4) method.
+
+    Args:
+        rhs (numba function): compiled right-hand side rhs(t, y, params, out).
+        t_span (tuple): (t0, t_end).
+        y0 (array-like): initial state.
+        params (ndarray): float array passed through to rhs.
+        t_eval (array-like, optional): output times inside t_span, sorted along the direction of
+            integration. Defaults to (t0, t_end).
+        rtol, atol (float): relative and absolute error tolerances.
+        first_step (float, optional): initial step size; chosen automatically if None.
+        max_steps (int): give up after this many accepted steps.
+
+    Returns:
+        SimpleNamespace: t, y (shape (n, len(t)) like solve_ivp), nfev, nstep, nreject, success and
+            message. Integration stops early (success=False) after max_steps, when the step size
+            falls below the rounding of t, or when the error estimate is NaN or inf.
+    """
+    t0, t_end = float(t_span[0]), float(t_span[1])
+    y0 = np.asarray(y0, dtype=float)
+    t_eval = np.array([t0, t_end] if t_eval is None else t_eval, dtype=float)
+    params = np.asarray(params, dtype=float)
+    y_out, n_done, t_last, nfev, nstep, nreject, status = _dopri45(
+        rhs, t0, t_end, y0, params, t_eval, rtol, atol,
+        0.0 if first_step is None else abs(first_step), max_steps)
+    return SimpleNamespace(t=t_eval[:n_done], y=y_out[:n_done].T, nfev=nfev, nstep=nstep,
+                           nreject=nreject, success=(status == 0 and t_last == t_end), message=MESSAGES[status])
+
+
+# ==== Benchmark against solve_ivp on the proton case ====
+
+if __name__ == "__main__":
+    from scipy.integrate import solve_ivp
+    from discussion19_activity_solution import ode, q, m, B_field, r0, v0, t_tot, steps
+
+    Y0 = np.concatenate((r0, v0)).astype(float)
+    t_eval = np.linspace(0, t_tot, steps)
+    params = np.array([q/m, *B_field], dtype=float)
+
+    # compile once outside the timing
+    solve_dopri45(lorentz_rhs, (0, t_tot), Y0, params, t_eval=t_eval[:10])
+
+    for rtol, atol in [(1e-3, 1e-6), (1e-6, 1e-9), (1e-9, 1e-12)]:
+        t1 = time.perf_counter()
+        sol_ref = solve_ivp(ode, [0, t_tot], Y0, t_eval=t_eval, rtol=rtol, atol=atol)
+        t2 = time.perf_counter()
+        sol = solve_dopri45(lorentz_rhs, (0, t_tot), Y0, params, t_eval=t_eval, rtol=rtol, atol=atol)
+        t3 = time.perf_counter()
+        diff = np.max(np.abs(sol.y - sol_ref.y)[:3])
+        print(f"rtol={rtol:.0e}: solve_ivp {t2-t1:.3f} s ({sol_ref.nfev} rhs calls),"
+              f" dopri45 {t3-t2:.4f} s ({sol.nfev} rhs calls), speedup {(t2-t1)/(t3-t2):.0f}x,"
+              f" max |r diff| = {diff:.2e} m")
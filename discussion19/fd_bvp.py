@@ -0,0 +1,110 @@
+'''
+Banded finite-difference solver for linear second-order boundary value problems:
+
+    y''(x) + p(x) y'(x) + q(x) y(x) = r(x),   y(a) = ya,  y(b) = yb
+
+With central differences every interior equation only couples y_{i-1}, y_i and y_{i+1},
+so the matrix is tridiagonal. Instead of filling a dense (N-1) x (N-1) matrix
+(O(N^2) memory, O(N^3) time with np.linalg.solve) we store only the three diagonals
+in LAPACK banded form and solve with scipy.linalg.solve_banded, which is O(N) in both.
+
+Example (the demo problem y'' + y = 0, y(0)=0, y(pi/2)=1):
+    x, y = solve_linear_bvp_fd(0, 1, 0, 0, np.pi/2, 0, 1, N=50)
+'''
+import time
+import numpy as np
+from scipy.linalg import solve_banded
+
+
+def _on_grid(coef, x):
+    # coefficients can be constants or vectorized functions of x
+    if callable(coef):
+        return np.broadcast_to(np.asarray(coef(x), dtype=float), x.shape)
+    return np.full(x.shape, float(coef))
+
+
+def assemble_banded(p, q, r, a, b, ya, yb, N):
+    """
+    Builds the tridiagonal system for the N-1 interior points directly in banded form.
+
+    Args:
+        p, q, r (float or callable): coefficients of y'' + p y' + q y = r.
+        a, b (float): interval ends.
+        ya, yb (float): Dirichlet boundary values.
+        N (int): number of grid intervals (N+1 grid points).
+
+    Returns:
+        tuple: x (N+1 grid points), ab (3, N-1) banded matrix for solve_banded((1, 1), ...), rhs (N-1,).
+    """
+    x = np.linspace(a, b, N+1)
+    h = x[1] - x[0]
+    xi = x[1:-1]
+    hp = 0.5*h*_on_grid(p, xi)
+
+    # multiply each equation by h^2:
+    # (1 - h p/2) y_{i-1} + (h^2 q - 2) y_i + (1 + h p/2) y_{i+1} = h^2 r
+    ab = np.empty((3, N-1))
+    ab[0, 1:] = 1 + hp[:-1]          # upper diagonal, shifted right
+    ab[1] = h*h*_on_grid(q, xi) - 2  # main diagonal
+    ab[2, :-1] = 1 - hp[1:]          # lower diagonal, shifted left
+    ab[0, 0] = ab[2, -1] = 0         # unused corners of the band
+
+    rhs = h*h*_on_grid(r, xi)
+    rhs[0] -= (1 - hp[0])*ya
+    rhs[-1] -= (1 + hp[-1])*yb
+    return x, ab, rhs
+
+
+def solve_linear_bvp_fd(p, q, r, a, b, ya, yb, N):
+    """
+    Solves y'' + p(x) y' + q(x) y = r(x) with y(a)=ya, y(b)=yb on N+1 grid points in O(N).
+
+    Returns:
+        tuple: x and y arrays of length N+1, including the boundary points.
+    """
+    x, ab, rhs = assemble_banded(p, q, r, a, b, ya, yb, N)
+    y = np.empty(N+1)
+    y[0], y[-1] = ya, yb
+    y[1:-1] = solve_banded((1, 1), ab, rhs, overwrite_ab=True, overwrite_b=True, check_finite=False)
+    return x, y
+
+
+def solve_dense_fd(a, b, N):
+    # the dense assembly from demo2_solve_bvp.py (y'' + y = 0), kept as the benchmark reference
+    x = np.linspace(a, b, N+1)
+    h = x[1] - x[0]
+    A = np.zeros((N-1, N-1))
+    bvec = np.zeros(N-1)
+    for i in range(N-1):
+        if i > 0:
+            A[i, i-1] = -1
+        A[i, i] = 2 - h**2
+        if i < N-2:
+            A[i, i+1] = -1
+    bvec[-1] = 1
+    return x, np.concatenate(([0], np.linalg.solve(A, bvec), [1]))
+
+
+# ==== Scaling benchmark ====
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scaling of the banded vs dense FD BVP solver")
+    parser.add_argument("-nmax", type=int, default=10**7, help="largest grid for the banded solver")
+    parser.add_argument("-nmax_dense", type=int, default=4000, help="largest grid for the dense solver")
+    args = parser.parse_args()
+
+    a, b = 0, np.pi/2
+    for N in [100, 300, 1000, 3000, 10**4, 3*10**4, 10**5, 10**6, 10**7]:
+        if N > args.nmax:
+            break
+        t0 = time.perf_counter()
+        x, y = solve_linear_bvp_fd(0, 1, 0, a, b, 0, 1, N)
+        t_band = time.perf_counter() - t0
+        line = f"N = {N:>9d}: banded {t_band:8.4f} s, max error {np.max(np.abs(y - np.sin(x))):.2e}"
+        if N <= args.nmax_dense:
+            t0 = time.perf_counter()
+            solve_dense_fd(a, b, N)
+            line += f" | dense {time.perf_counter() - t0:8.4f} s"
+        print(line)
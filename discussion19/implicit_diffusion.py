@@ -0,0 +1,194 @@
+'''
+Unconditionally stable implicit solvers for the diffusion equation
+    partial T/partial t = d * laplace T
+with fixed-temperature (Dirichlet) boundaries.
+
+The explicit updates in demo4_1d_diffusion.py and demo5_2d_diffusion.py need
+d*dt/dx^2 < 0.5 (1D) or < 0.25 (2D). Here:
+- CrankNicolson1D solves (I - a/2 L) T_new = (I + a/2 L) T_old, with a = d*dt/dx^2.
+- ADI2D uses the Peaceman-Rachford scheme: half a step implicit in x, then half a step
+  implicit in y, so each half step is a set of independent tridiagonal solves.
+The sparse LU factorizations are computed once in __init__ and reused every step,
+so a step costs O(number of cells) and dt is only limited by accuracy.
+
+Boundaries work like the demos: whatever values are on the edges of the initial array
+(e.g. temps[-1] = 77 or temps[:, -1] = 77) are held fixed.
+
+Crank-Nicolson damps sharp features only slowly when a >> 1, and the 273 K -> 77 K jump
+at the boundary would ring for many steps. Following Rannacher, the first
+startup_steps steps use backward Euler, which damps those modes strongly.
+'''
+import time
+import numpy as np
+import scipy.sparse as sparse
+from scipy.sparse.linalg import splu
+
+
+def second_difference(n):
+    # tridiagonal [1, -2, 1] matrix for n interior points (Dirichlet ends handled separately)
+    return sparse.diags([np.ones(n-1), -2*np.ones(n), np.ones(n-1)], [-1, 0, 1], format='csc')
+
+
+class CrankNicolson1D:
+    """
+    Crank-Nicolson solver for a 1D rod with fixed end temperatures.
+
+    Attributes:
+        temps (ndarray): current temperatures, including the two fixed ends.
+        t (float): current time.
+        alpha (float): d*dt/dx^2.
+    """
+
+    def __init__(self, temps, diff, dx, dt, startup_steps=2):
+        self.temps = np.array(temps, dtype=float)
+        self.dt = dt
+        self.t = 0.0
+        self.nstep = 0
+        self.startup_steps = startup_steps
+        self.alpha = diff*dt/dx**2
+        n = self.temps.size - 2
+        eye = sparse.identity(n, format='csc')
+        L = second_difference(n)
+        self._lu_cn = splu(eye - 0.5*self.alpha*L)
+        self._lu_be = splu(eye - self.alpha*L) if startup_steps > 0 else None
+
+    def step(self, nsteps=1):
+        T, a = self.temps, self.alpha
+        for _ in range(nsteps):
+            u = T[1:-1]
+            if self.nstep < self.startup_steps:
+                rhs = u.copy()
+                rhs[0] += a*T[0]
+                rhs[-1] += a*T[-1]
+                T[1:-1] = self._lu_be.solve(rhs)
+            else:
+                rhs = u + 0.5*a*(T[:-2] - 2*u + T[2:])
+                # the fixed ends appear in the implicit half too
+                rhs[0] += 0.5*a*T[0]
+                rhs[-1] += 0.5*a*T[-1]
+                T[1:-1] = self._lu_cn.solve(rhs)
+            self.t += self.dt
+            self.nstep += 1
+        return T
+
+
+class ADI2D:
+    """
+    Peaceman-Rachford ADI solver for a 2D plate (dx = dy) with fixed edge temperatures.
+
+    Attributes:
+        temps (ndarray): current temperatures, shape (ny, nx), edges held fixed.
+        t (float): current time.
+        alpha (float): d*dt/dx^2.
+    """
+
+    def __init__(self, temps, diff, dx, dt, startup_steps=2):
+        self.temps = np.array(temps, dtype=float)
+        self.dt = dt
+        self.t = 0.0
+        self.nstep = 0
+        self.startup_steps = startup_steps
+        self.alpha = diff*dt/dx**2
+        ny, nx = self.temps.shape
+        a = self.alpha
+        # one factorization per direction and scheme, each shared by all rows/columns
+        self._lu_x = splu(sparse.identity(nx-2, format='csc') - 0.5*a*second_difference(nx-2))
+        self._lu_y = splu(sparse.identity(ny-2, format='csc') - 0.5*a*second_difference(ny-2))
+        if startup_steps > 0:
+            self._lu_x_be = splu(sparse.identity(nx-2, format='csc') - a*second_difference(nx-2))
+            self._lu_y_be = splu(sparse.identity(ny-2, format='csc') - a*second_difference(ny-2))
+
+    def _solve_x(self, lu, rhs, w):
+        # rhs has shape (ny-2, nx-2): every row is an independent system along x
+        T = self.temps
+        rhs[:, 0] += w*T[1:-1, 0]
+        rhs[:, -1] += w*T[1:-1, -1]
+        T[1:-1, 1:-1] = lu.solve(np.ascontiguousarray(rhs.T)).T
+
+    def _solve_y(self, lu, rhs, w):
+        # rhs has shape (ny-2, nx-2): every column is an independent system along y
+        T = self.temps
+        rhs[0] += w*T[0, 1:-1]
+        rhs[-1] += w*T[-1, 1:-1]
+        T[1:-1, 1:-1] = lu.solve(rhs)
+
+    def step(self, nsteps=1):
+        T, a = self.temps, self.alpha
+        for _ in range(nsteps):
+            if self.nstep < self.startup_steps:
+                # backward Euler split into x and y sweeps (locally one-dimensional)
+                self._solve_x(self._lu_x_be, T[1:-1, 1:-1].copy(), a)
+                self._solve_y(self._lu_y_be, T[1:-1, 1:-1].copy(), a)
+            else:
+                u = T[1:-1, 1:-1]
+                # half step: explicit in y, implicit in x
+                rhs = u + 0.5*a*(T[:-2, 1:-1] - 2*u + T[2:, 1:-1])
+                self._solve_x(self._lu_x, rhs, 0.5*a)
+                u = T[1:-1, 1:-1]
+                # half step: explicit in x, implicit in y
+                rhs = u + 0.5*a*(T[1:-1, :-2] - 2*u + T[1:-1, 2:])
+                self._solve_y(self._lu_y, rhs, 0.5*a)
+            self.t += self.dt
+            self.nstep += 1
+        return T
+
+
+# ==== Explicit references (the demo4/demo5 update, vectorized) ====
+
+def explicit_1d(temps, alpha, nsteps):
+    T = np.array(temps, dtype=float)
+    for _ in range(nsteps):
+        T[1:-1] = T[1:-1] + alpha*(T[:-2] - 2*T[1:-1] + T[2:])
+    return T
+
+def explicit_2d(temps, alpha, nsteps):
+    T = np.array(temps, dtype=float)
+    for _ in range(nsteps):
+        T[1:-1, 1:-1] = T[1:-1, 1:-1] + alpha*(T[:-2, 1:-1] + T[2:, 1:-1] + T[1:-1, :-2]
+                                               + T[1:-1, 2:] - 4*T[1:-1, 1:-1])
+    return T
+
+
+# ==== Benchmark: implicit at 100x the explicit stability limit ====
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crank-Nicolson/ADI vs explicit FTCS")
+    parser.add_argument("-nx", type=int, default=200, help="grid points per side")
+    parser.add_argument("-t_end", type=float, default=0.05, help="final time")
+    parser.add_argument("-factor", type=float, default=100, help="dt as a multiple of the explicit limit")
+    args = parser.parse_args()
+
+    diff = 1.16
+    dx = 1.0/(args.nx - 1)
+
+    # ---- 1D rod, 273 K with the far end held at 77 K ----
+    temps = 273*np.ones(args.nx)
+    temps[-1] = 77.
+    dt_exp = 0.45*dx**2/diff
+    n_exp = int(np.ceil(args.t_end/dt_exp))
+    t0 = time.perf_counter()
+    T_exp = explicit_1d(temps, diff*(args.t_end/n_exp)/dx**2, n_exp)
+    t_exp = time.perf_counter() - t0
+    n_imp = max(1, int(round(n_exp/args.factor)))
+    t0 = time.perf_counter()
+    T_cn = CrankNicolson1D(temps, diff, dx, args.t_end/n_imp).step(n_imp)
+    t_cn = time.perf_counter() - t0
+    print(f"1D nx={args.nx}: explicit {n_exp} steps {t_exp:.3f} s | Crank-Nicolson {n_imp} steps"
+          f" {t_cn:.3f} s | max |diff| = {np.max(np.abs(T_cn - T_exp)):.3f} K")
+
+    # ---- 2D plate, 273 K with the right edge held at 77 K ----
+    temps = 273*np.ones((args.nx, args.nx))
+    temps[:, -1] = 77.
+    dt_exp = 0.24*dx**2/diff
+    n_exp = int(np.ceil(args.t_end/dt_exp))
+    t0 = time.perf_counter()
+    T_exp = explicit_2d(temps, diff*(args.t_end/n_exp)/dx**2, n_exp)
+    t_exp = time.perf_counter() - t0
+    n_imp = max(1, int(round(n_exp/args.factor)))
+    t0 = time.perf_counter()
+    T_adi = ADI2D(temps, diff, dx, args.t_end/n_imp).step(n_imp)
+    t_adi = time.perf_counter() - t0
+    print(f"2D {args.nx}x{args.nx}: explicit {n_exp} steps {t_exp:.3f} s | ADI {n_imp} steps"
+          f" {t_adi:.3f} s | max |diff| = {np.max(np.abs(T_adi - T_exp)):.3f} K")
@@ -0,0 +1,397 @@
+'''
+Symplectic integrators and an N-body extension of the orbit demo (demo1_solve_ivp.py).
+
+solve_ivp's RK45 is not symplectic: on a Kepler orbit its energy error grows steadily,
+and the orbit spirals in or out over many periods. Symplectic schemes keep the energy
+error bounded for arbitrarily long runs:
+- leapfrog (kick-drift-kick velocity Verlet), 2nd order, one force evaluation per step
+- Yoshida's 4th order composition of three leapfrog steps, three force evaluations per step
+
+Forces are vectorized over all bodies, either
+- a fixed central mass (the demo1 setup, kepler_accel),
+- direct summation over all pairs, O(N^2), or
+- a Barnes-Hut octree, O(N log N): distant groups of bodies are replaced by their
+  total mass at their centre of mass when (cell size)/(distance) < theta.
+  Use it for N >~ 1e4; theta = 0.5 gives ~0.1% force errors.
+The pair sums and the tree are compiled with numba and run in parallel over bodies.
+
+Example:
+    accel = make_accel(mass, G=1.0, softening=0.01, method='tree')
+    pos, vel, info = integrate(pos0, vel0, accel, dt=1e-3, nsteps=1000, method='yoshida4')
+'''
+import time
+import numpy as np
+from numba import njit, prange
+
+
+# ==== Forces ====
+
+def kepler_accel(GM):
+    # a = -GM r/|r|^3 for test particles around a fixed central mass, pos shape (N, 3)
+    def accel(pos):
+        r = np.sqrt(np.sum(pos*pos, axis=1, keepdims=True))
+        return -GM*pos/r**3
+    return accel
+
+
+@njit(parallel=True)
+def accel_direct(pos, mass, G, eps):
+    n = pos.shape[0]
+    acc = np.zeros((n, 3))
+    eps2 = eps*eps
+    for i in prange(n):
+        ax = ay = az = 0.0
+        for j in range(n):
+            if j == i:
+                continue
+            dx = pos[j, 0] - pos[i, 0]
+            dy = pos[j, 1] - pos[i, 1]
+            dz = pos[j, 2] - pos[i, 2]
+            r2 = dx*dx + dy*dy + dz*dz + eps2
+            f = G*mass[j]/(r2*np.sqrt(r2))
+            ax += f*dx
+            ay += f*dy
+            az += f*dz
+        acc[i, 0] = ax
+        acc[i, 1] = ay
+        acc[i, 2] = az
+    return acc
+
+
+@njit(parallel=True)
+def potential_energy(pos, mass, G, eps):
+    n = pos.shape[0]
+    total = 0.0
+    for i in prange(n):
+        e = 0.0
+        for j in range(i+1, n):
+            dx = pos[j, 0] - pos[i, 0]
+            dy = pos[j, 1] - pos[i, 1]
+            dz = pos[j, 2] - pos[i, 2]
+            e -= G*mass[i]*mass[j]/np.sqrt(dx*dx + dy*dy + dz*dz + eps*eps)
+        total += e
+    return total
+
+
+# ---- Barnes-Hut octree, stored in flat arrays ----
+
+MAX_DEPTH = 48
+
+@njit
+def _octant(p, c):
+    return (p[0] > c[0]) + 2*(p[1] > c[1]) + 4*(p[2] > c[2])
+
+@njit
+def build_tree(pos, mass, max_nodes):
+    """
+    Builds the octree. Node 0 is the root; children always have larger indices than their parent,
+    so masses and centres of mass can be accumulated in one reverse pass.
+    body[k] >= 0 marks a leaf holding that body, -1 an internal node.
+    Returns the number of nodes, or -1 if max_nodes was too small.
+    """
+    n = pos.shape[0]
+    center = np.empty((max_nodes, 3))
+    half = np.empty(max_nodes)
+    child = -np.ones((max_nodes, 8), dtype=np.int64)
+    body = -np.ones(max_nodes, dtype=np.int64)
+    node_mass = np.zeros(max_nodes)
+    com = np.zeros((max_nodes, 3))
+
+    lo = pos[0].copy()
+    hi = pos[0].copy()
+    for i in range(n):
+        for k in range(3):
+            lo[k] = min(lo[k], pos[i, k])
+            hi[k] = max(hi[k], pos[i, k])
+    for k in range(3):
+        center[0, k] = 0.5*(lo[k] + hi[k])
+    half[0] = 0.5*max(hi[0]-lo[0], hi[1]-lo[1], hi[2]-lo[2])*(1 + 1e-10) + 1e-300
+    count = 1
+
+    for i in range(n):
+        node = 0
+        depth = 0
+        while True:
+            o = _octant(pos[i], center[node])
+            c = child[node, o]
+            if c == -1:
+                if count >= max_nodes:
+                    return -1, center, half, child, body, node_mass, com
+                c = count
+                count += 1
+                child[node, o] = c
+                h = 0.5*half[node]
+                for k in range(3):
+                    center[c, k] = center[node, k] + (h if (o >> k) & 1 else -h)
+                half[c] = h
+                body[c] = i
+                break
+            if body[c] >= 0:
+                if depth >= MAX_DEPTH:
+                    # (nearly) coincident bodies: merge the mass into the existing leaf
+                    node_mass[c] += mass[i]
+                    break
+                # split the occupied leaf: push its body one level down, then keep descending
+                j = body[c]
+                body[c] = -1
+                if count >= max_nodes:
+                    return -1, center, half, child, body, node_mass, com
+                oj = _octant(pos[j], center[c])
+                g = count
+                count += 1
+                child[c, oj] = g
+                h = 0.5*half[c]
+                for k in range(3):
+                    center[g, k] = center[c, k] + (h if (oj >> k) & 1 else -h)
+                half[g] = h
+                body[g] = j
+                node_mass[g] = node_mass[c]  # carries any merged mass
+                node_mass[c] = 0.0
+            node = c
+            depth += 1
+
+    for node in range(count-1, -1, -1):
+        if body[node] >= 0:
+            b = body[node]
+            node_mass[node] += mass[b]
+            for k in range(3):
+                com[node, k] = pos[b, k]
+        else:
+            m = 0.0
+            cx = cy = cz = 0.0
+            for o in range(8):
+                c = child[node, o]
+                if c >= 0:
+                    m += node_mass[c]
+                    cx += node_mass[c]*com[c, 0]
+                    cy += node_mass[c]*com[c, 1]
+                    cz += node_mass[c]*com[c, 2]
+            node_mass[node] = m
+            if m > 0:
+                com[node, 0] = cx/m
+                com[node, 1] = cy/m
+                com[node, 2] = cz/m
+    return count, center, half, child, body, node_mass, com
+
+@njit(parallel=True)
+def accel_tree(pos, G, eps, theta, half, child, body, node_mass, com):
+    n = pos.shape[0]
+    acc = np.zeros((n, 3))
+    eps2 = eps*eps
+    theta2 = theta*theta
+    for i in prange(n):
+        stack = np.empty(8*MAX_DEPTH + 8, dtype=np.int64)
+        top = 0
+        stack[top] = 0
+        top += 1
+        ax = ay = az = 0.0
+        while top > 0:
+            top -= 1
+            node = stack[top]
+            if body[node] == i:
+                continue
+            dx = com[node, 0] - pos[i, 0]
+            dy = com[node, 1] - pos[i, 1]
+            dz = com[node, 2] - pos[i, 2]
+            r2 = dx*dx + dy*dy + dz*dz
+            size = 2*half[node]
+            if body[node] >= 0 or size*size < theta2*r2:
+                r2 += eps2
+                f = G*node_mass[node]/(r2*np.sqrt(r2))
+                ax += f*dx
+                ay += f*dy
+                az += f*dz
+            else:
+                for o in range(8):
+                    c = child[node, o]
+                    if c >= 0:
+                        stack[top] = c
+                        top += 1
+        acc[i, 0] = ax
+        acc[i, 1] = ay
+        acc[i, 2] = az
+    return acc
+
+
+def make_accel(mass, G=1.0, softening=0.0, method='auto', theta=0.5):
+    """
+    Returns accel(pos) -> (N, 3) accelerations for N mutually interacting bodies.
+
+    Args:
+        mass (ndarray): body masses, shape (N,).
+        G (float): gravitational constant in the units of pos/mass/time.
+        softening (float): Plummer softening length.
+        method (str): 'direct' (O(N^2)), 'tree' (Barnes-Hut, O(N log N)) or 'auto' (tree for N >= 1e4).
+        theta (float): opening angle of the tree.
+    """
+    mass = np.asarray(mass, dtype=float)
+    if method == 'auto':
+        method = 'tree' if mass.size >= 10**4 else 'direct'
+    if method == 'direct':
+        return lambda pos: accel_direct(pos, mass, G, softening)
+    if method != 'tree':
+        raise ValueError(f"Unknown method {method!r}, choose 'direct', 'tree' or 'auto'")
+
+    state = {'max_nodes': 4*mass.size + 64}
+    def accel(pos):
+        while True:
+            count, center, half, child, body, node_mass, com = build_tree(pos, mass, state['max_nodes'])
+            if count > 0:
+                break
+            state['max_nodes'] *= 2
+        return accel_tree(pos, G, softening, theta, half[:count], child[:count], body[:count],
+                          node_mass[:count], com[:count])
+    return accel
+
+
+# ==== Symplectic integrators ====
+
+_CBRT2 = 2**(1/3)
+_W1 = 1/(2 - _CBRT2)
+_W0 = -_CBRT2*_W1
+YOSHIDA_C = (_W1/2, (_W0 + _W1)/2, (_W0 + _W1)/2, _W1/2)  # drift coefficients
+YOSHIDA_D = (_W1, _W0, _W1)                              # kick coefficients
+
+
+def integrate(pos, vel, accel, dt, nsteps, method='leapfrog', save_every=0, energy=None):
+    """
+    Advances positions and velocities with a symplectic integrator.
+
+    Args:
+        pos, vel (ndarray): initial positions and velocities, shape (N, 3).
+        accel (callable): accel(pos) -> (N, 3).
+        dt (float): time step.
+        nsteps (int): number of steps.
+        method (str): 'leapfrog' or 'yoshida4'.
+        save_every (int): store positions every save_every steps (0: only the final state).
+        energy (callable, optional): energy(pos, vel), evaluated at every saved step.
+
+    Returns:
+        tuple: final pos, final vel, and a dict with 'trajectory' (n_saved, N, 3),
+            'energy' (n_saved,) if requested, 'nforce' and 'time'.
+    """
+    pos = np.array(pos, dtype=float)
+    vel = np.array(vel, dtype=float)
+    if method not in ('leapfrog', 'yoshida4'):
+        raise ValueError(f"Unknown method {method!r}, choose 'leapfrog' or 'yoshida4'")
+    traj, energies = [], []
+    def record():
+        traj.append(pos.copy())
+        if energy is not None:
+            energies.append(energy(pos, vel))
+
+    t0 = time.perf_counter()
+    if save_every:
+        record()
+    nforce = 0
+    a = accel(pos)
+    nforce += 1
+    for n in range(1, nsteps+1):
+        if method == 'leapfrog':
+            vel += 0.5*dt*a
+            pos += dt*vel
+            a = accel(pos)
+            vel += 0.5*dt*a
+            nforce += 1
+        else:
+            for k in range(3):
+                pos += YOSHIDA_C[k]*dt*vel
+                vel += YOSHIDA_D[k]*dt*accel(pos)
+            pos += YOSHIDA_C[3]*dt*vel
+            nforce += 3
+        if save_every and n % save_every == 0:
+            record()
+    info = {'nforce': nforce, 'time': time.perf_counter() - t0}
+    info['trajectory'] = np.array(traj) if traj else pos[None].copy()
+    if energy is not None:
+        info['energy'] = np.array(energies) if energies else np.array([energy(pos, vel)])
+    return pos, vel, info
+
+
+def nbody_energy(mass, G=1.0, softening=0.0):
+    mass = np.asarray(mass, dtype=float)
+    return lambda pos, vel: 0.5*np.sum(mass*np.sum(vel*vel, axis=1)) + potential_energy(pos, mass, G, softening)
+
+def kepler_energy(GM):
+    # specific orbital energy of each test particle, summed
+    return lambda pos, vel: np.sum(0.5*np.sum(vel*vel, axis=1) - GM/np.sqrt(np.sum(pos*pos, axis=1)))
+
+
+def plummer_sphere(n, seed=42):
+    # equilibrium star cluster (total mass 1, G = 1, scale radius 1), Aarseth, Henon & Wielen (1974)
+    rng = np.random.default_rng(seed)
+    r = 1/np.sqrt(rng.uniform(1e-3, 1, n)**(-2/3) - 1)
+    def isotropic(length):
+        cos_t = rng.uniform(-1, 1, n)
+        phi = rng.uniform(0, 2*np.pi, n)
+        sin_t = np.sqrt(1 - cos_t**2)
+        return length[:, None]*np.column_stack((sin_t*np.cos(phi), sin_t*np.sin(phi), cos_t))
+    # speeds by rejection sampling from g(q) = q^2 (1-q^2)^3.5
+    q = np.empty(n)
+    todo = np.arange(n)
+    while todo.size:
+        x, y = rng.uniform(0, 1, todo.size), rng.uniform(0, 0.1, todo.size)
+        ok = y < x**2*(1 - x**2)**3.5
+        q[todo[ok]] = x[ok]
+        todo = todo[~ok]
+    v_esc = np.sqrt(2)*(1 + r**2)**(-0.25)
+    return isotropic(r), isotropic(q*v_esc), np.full(n, 1/n)
+
+
+# ==== Benchmark: long-run energy error and wall time ====
+
+if __name__ == "__main__":
+    import argparse
+    from scipy.integrate import solve_ivp
+    from demo1_solve_ivp import ode_system, GM, r0, v0
+
+    parser = argparse.ArgumentParser(description="Symplectic integrators and Barnes-Hut N-body benchmark")
+    parser.add_argument("-orbits", type=int, default=100, help="number of Kepler periods")
+    parser.add_argument("-n", type=int, nargs="+", default=[1000, 10000], help="N-body sizes")
+    parser.add_argument("-nsteps", type=int, default=20, help="N-body steps")
+    args = parser.parse_args()
+
+    # ---- Kepler orbit from demo1_solve_ivp.py ----
+    a_orbit = 1/(2/np.linalg.norm(r0) - np.dot(v0, v0)/GM)
+    period = 2*np.pi*np.sqrt(a_orbit**3/GM)
+    t_end = args.orbits*period
+    E = kepler_energy(GM)
+    E0 = E(r0[None], v0[None])
+
+    t1 = time.perf_counter()
+    sol = solve_ivp(ode_system, (0, t_end), np.concatenate((r0, v0)).astype(float), rtol=1e-6, atol=1e-6)
+    t_rk = time.perf_counter() - t1
+    E_rk = E(sol.y[:3, -1][None], sol.y[3:, -1][None])
+    print(f"Kepler, {args.orbits} orbits: RK45 {sol.nfev} rhs calls, {t_rk:.3f} s, |dE/E| = {abs(E_rk/E0 - 1):.2e}")
+    for method, steps_per_orbit in [('leapfrog', 2000), ('yoshida4', 200)]:
+        nsteps = args.orbits*steps_per_orbit
+        pos, vel, info = integrate(r0[None], v0[None], kepler_accel(GM), t_end/nsteps, nsteps, method=method,
+                                   save_every=steps_per_orbit//20, energy=E)
+        dE = np.max(np.abs(info['energy']/E0 - 1))
+        print(f"Kepler, {args.orbits} orbits: {method} {info['nforce']} force calls, {info['time']:.3f} s,"
+              f" max |dE/E| = {dE:.2e}")
+
+    # ---- Plummer cluster, G = 1 ----
+    for n in args.n:
+        pos, vel, mass = plummer_sphere(n)
+        eps = 0.01
+        E = nbody_energy(mass, softening=eps)
+        if n <= 20000:
+            a_direct = make_accel(mass, softening=eps, method='direct')
+            a_direct(pos[:2])  # compile
+            t1 = time.perf_counter()
+            acc_ref = a_direct(pos)
+            t_direct = time.perf_counter() - t1
+        a_tree = make_accel(mass, softening=eps, method='tree')
+        a_tree(pos[:16])  # compile
+        t1 = time.perf_counter()
+        acc = a_tree(pos)
+        t_tree = time.perf_counter() - t1
+        line = f"N = {n}: tree force {t_tree:.3f} s"
+        if n <= 20000:
+            err = np.median(np.linalg.norm(acc - acc_ref, axis=1)/np.linalg.norm(acc_ref, axis=1))
+            line += f", direct force {t_direct:.3f} s, median relative force error {err:.1e}"
+        E0 = E(pos, vel)
+        _, _, info = integrate(pos, vel, a_tree, 1e-3, args.nsteps, method='leapfrog', energy=E)
+        line += f" | leapfrog {args.nsteps} steps {info['time']:.2f} s, |dE/E| = {abs(info['energy'][-1]/E0 - 1):.1e}"
+        print(line)
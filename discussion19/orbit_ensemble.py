@@ -0,0 +1,127 @@
+'''
+Ensemble mode for the Kepler orbits of demo1_solve_ivp.py.
+
+Running one solve_ivp per initial condition pays the Python overhead of every RHS call
+once per orbit. Here an (N, 6) array of initial states (x, y, z, vx, vy, vz) is stacked
+into a single ODE system whose right-hand side is evaluated for all members with a few
+array operations. The state vector is stored component-major, Y = (x_1..x_N, y_1..y_N, ...),
+so each component is a contiguous slice.
+
+All members of one solve_ivp call share its step size, and solve_ivp controls the RMS
+of the error over the whole state vector. So that every member still meets rtol/atol,
+the tolerances are divided by sqrt(6 * members per call) (the max of M numbers is at most
+sqrt(M) times their RMS). Large ensembles are therefore split into chunks, which keeps that
+tightening small, and the chunks can be spread over a process Pool.
+The RHS also accepts the (6N, k) arrays that solve_ivp passes with vectorized=True,
+which the implicit methods ('Radau', 'BDF') use for their finite-difference Jacobians.
+
+Example:
+    states = np.column_stack((r0s, v0s))  # (N, 6)
+    Y = solve_ensemble(states, (0, 2e4), np.linspace(0, 2e4, 1000), GM)  # (N, 1000, 6)
+'''
+import time
+from functools import partial
+from multiprocessing import Pool
+import numpy as np
+from scipy.integrate import solve_ivp
+
+
+def ensemble_rhs(t, Y, GM):
+    # Y has shape (6N,) or (6N, k); d(r)/dt = v, d(v)/dt = -GM r/|r|^3 for every member
+    Y = Y.reshape((6, -1) + Y.shape[1:])
+    r = Y[:3]
+    inv_r3 = np.sum(r*r, axis=0)**-1.5
+    return np.concatenate((Y[3:], -GM*r*inv_r3)).reshape((-1,) + Y.shape[2:])
+
+
+def _solve_chunk(states, t_span, t_eval, GM, method, rtol, atol):
+    n = states.shape[0]
+    # solve_ivp bounds the RMS error over all 6n components; bound each component instead
+    scale = np.sqrt(6*n)
+    sol = solve_ivp(ensemble_rhs, t_span, states.T.ravel(), t_eval=t_eval, args=(GM,),
+                    method=method, vectorized=True, rtol=rtol/scale, atol=atol/scale)
+    if not sol.success:
+        raise RuntimeError(sol.message)
+    # (6N, T) -> (N, T, 6)
+    return sol.y.reshape(6, n, -1).transpose(1, 2, 0)
+
+
+def solve_ensemble(states, t_span, t_eval, GM, method='RK45', rtol=1e-6, atol=1e-3,
+                   chunk_size=256, processes=None):
+    """
+    Integrates an ensemble of Kepler orbits.
+
+    Args:
+        states (ndarray): initial states, shape (N, 6): x, y, z [m], vx, vy, vz [m/s].
+        t_span (tuple): integration interval [s].
+        t_eval (ndarray): output times, length T.
+        GM (float): gravitational parameter of the central mass [m^3/s^2].
+        method (str): any solve_ivp method.
+        rtol, atol (float): solve_ivp tolerances.
+        chunk_size (int): members per solve_ivp call; None puts everything in one call.
+        processes (int, optional): number of worker processes for the chunks; None runs them serially.
+
+    Returns:
+        ndarray: states at t_eval, shape (N, T, 6).
+    """
+    states = np.asarray(states, dtype=float)
+    t_eval = np.asarray(t_eval, dtype=float)
+    n = states.shape[0]
+    chunk_size = n if chunk_size is None else chunk_size
+    chunks = [states[i:i+chunk_size] for i in range(0, n, chunk_size)]
+    solve = partial(_solve_chunk, t_span=t_span, t_eval=t_eval, GM=GM, method=method, rtol=rtol, atol=atol)
+
+    out = np.empty((n, t_eval.size, 6))
+    if processes and len(chunks) > 1:
+        with Pool(processes) as pool:
+            results = pool.map(solve, chunks)
+    else:
+        results = map(solve, chunks)
+    for i, res in zip(range(0, n, chunk_size), results):
+        out[i:i+chunk_size] = res
+    return out
+
+
+# ==== Benchmark: sweep over r0/v0 pairs ====
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    from demo1_solve_ivp import ode_system, GM
+
+    parser = argparse.ArgumentParser(description="Ensemble vs one-by-one solve_ivp orbit runs")
+    parser.add_argument("-n", type=int, default=2000, help="ensemble size")
+    parser.add_argument("-nloop", type=int, default=50, help="members for the one-by-one reference")
+    parser.add_argument("-chunk", type=int, default=256, help="members per solve_ivp call")
+    parser.add_argument("-processes", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    r = rng.uniform(6.8e6, 8e6, args.n)
+    v = rng.uniform(7000, 8000, args.n)
+    inc = rng.uniform(0, np.pi/4, args.n)
+    states = np.zeros((args.n, 6))
+    states[:, 0] = r
+    states[:, 4] = v*np.cos(inc)
+    states[:, 5] = v*np.sin(inc)
+    t_span = (0, 2e4)
+    t_eval = np.linspace(*t_span, 1000)
+    rtol, atol = 1e-6, 1e-3
+
+    t0 = time.perf_counter()
+    loop = np.array([solve_ivp(ode_system, t_span, s, t_eval=t_eval, rtol=rtol, atol=atol).y.T
+                     for s in states[:args.nloop]])
+    t_loop = (time.perf_counter() - t0)/args.nloop
+    # much tighter reference to measure the actual errors
+    ref = np.array([solve_ivp(ode_system, t_span, s, t_eval=t_eval, rtol=1e-12, atol=1e-9, method='DOP853').y.T
+                    for s in states[:args.nloop]])
+    print(f"one solve_ivp per orbit: {t_loop*1e3:.1f} ms/orbit -> {t_loop*args.n:.1f} s for {args.n} orbits,"
+          f" max position error {np.max(np.abs(loop[:, :, :3] - ref[:, :, :3])):.1f} m")
+
+    for chunk, processes in [(None, None), (args.chunk, None), (args.chunk, args.processes)]:
+        t0 = time.perf_counter()
+        Y = solve_ensemble(states, t_span, t_eval, GM, rtol=rtol, atol=atol, chunk_size=chunk, processes=processes)
+        t_ens = time.perf_counter() - t0
+        err = np.max(np.abs(Y[:args.nloop, :, :3] - ref[:, :, :3]))
+        print(f"ensemble (chunk={chunk}, processes={processes}): {t_ens:.2f} s for {args.n} orbits,"
+              f" speedup {t_loop*args.n/t_ens:.0f}x, max position error {err:.1f} m, output {Y.shape}")
@@ -0,0 +1,148 @@
+'''
+Vectorized shooting method for second-order BVPs:
+
+    y''(x) = f(x, y, y'),   y(a) = ya,  y(b) = yb
+
+The shooting method in demo2_solve_bvp.py bisects on the initial slope, running one
+solve_ivp per iterate (~40 integrations for one BVP). Here
+- a whole batch of slope guesses (or a batch of different BVPs in a parameter sweep)
+  is integrated as one vectorized ODE system, and
+- the variational equations for s = dy/d(slope) are integrated alongside,
+  s'' = f_y s + f_y' s',  s(a) = 0,  s'(a) = 1,
+  which gives the exact derivative of the residual y(b) - yb for Newton's method.
+solve_ivp controls the RMS error over the whole stacked system, so, as in orbit_ensemble.py,
+rtol/atol are divided by sqrt(4M) to hold for every member.
+For a linear problem Newton converges after a single update; nonlinear ones take a few.
+
+Example (the demo problem y'' = -y for a sweep of stiffness k):
+    k = np.linspace(0.5, 1.5, 1000)
+    f = lambda x, y, dy, k: -k*y
+    jac = lambda x, y, dy, k: (-k, 0)
+    sol = shoot(f, jac, 0, np.pi/2, 0, 1, guesses=np.ones_like(k), args=(k,))
+'''
+import time
+from types import SimpleNamespace
+import numpy as np
+from scipy.integrate import solve_ivp
+
+
+def _take(arg, idx):
+    # per-member arrays follow the active subset, scalars are passed through
+    return arg[idx] if np.ndim(arg) > 0 else arg
+
+
+def integrate_batch(f, f_jac, a, b, ya, slopes, args=(), t_eval=None, rtol=1e-8, atol=1e-10):
+    """
+    Integrates y and its slope sensitivity for M slopes at once.
+
+    Args:
+        f (callable): f(x, y, dy, *args) -> y'', vectorized over arrays of shape (M,).
+        f_jac (callable): f_jac(x, y, dy, *args) -> (df/dy, df/dy'), each scalar or shape (M,).
+        a, b (float): interval ends.
+        ya (float or ndarray): y(a), scalar or shape (M,).
+        slopes (ndarray): initial slopes y'(a), shape (M,).
+        args (tuple): extra arguments for f and f_jac, scalars or shape (M,).
+        t_eval (array-like, optional): points where the solution is stored; defaults to [b].
+        rtol, atol (float): tolerances for every member (tightened by sqrt(4M) for solve_ivp).
+
+    Returns:
+        OdeResult: solve_ivp result with y of shape (4, M, len(t)) holding (y, y', s, s').
+    """
+    slopes = np.asarray(slopes, dtype=float)
+    M = slopes.size
+
+    def rhs(x, Y):
+        y, dy, s, ds = Y.reshape(4, M)
+        fy, fdy = f_jac(x, y, dy, *args)
+        return np.concatenate((dy, f(x, y, dy, *args), ds, fy*s + fdy*ds))
+
+    Y0 = np.concatenate((np.broadcast_to(ya, (M,)), slopes, np.zeros(M), np.ones(M)))
+    # solve_ivp bounds the RMS error over all 4M components; bound each component instead
+    scale = np.sqrt(4*M)
+    sol = solve_ivp(rhs, (a, b), Y0, t_eval=[b] if t_eval is None else t_eval, rtol=rtol/scale, atol=atol/scale)
+    if not sol.success:
+        raise RuntimeError(sol.message)
+    sol.y = sol.y.reshape(4, M, -1)
+    return sol
+
+
+def shoot(f, f_jac, a, b, ya, yb, guesses, args=(), tol=1e-10, maxiter=20, rtol=1e-8, atol=1e-10):
+    """
+    Finds the initial slopes y'(a) that hit y(b) = yb, with Newton's method on all members at once.
+
+    Args:
+        f, f_jac (callable): see integrate_batch.
+        a, b (float): interval ends.
+        ya, yb (float or ndarray): boundary values, scalars or shape (M,).
+        guesses (ndarray): starting slopes, shape (M,). Several guesses for the same BVP can be used
+            to look for different roots of a nonlinear problem.
+        args (tuple): extra arguments for f and f_jac, scalars or shape (M,) (e.g. a parameter sweep).
+        tol (float): stop when |y(b) - yb| < tol for a member.
+        maxiter (int): maximum number of batched integrations.
+
+    Returns:
+        SimpleNamespace: slope (M,), residual (M,), converged (M,) bool, niter (batched integrations).
+    """
+    slope = np.array(guesses, dtype=float)
+    M = slope.size
+    ya = np.broadcast_to(np.asarray(ya, dtype=float), (M,))
+    yb = np.broadcast_to(np.asarray(yb, dtype=float), (M,))
+    residual = np.full(M, np.inf)
+    converged = np.zeros(M, dtype=bool)
+
+    niter = 0
+    for niter in range(1, maxiter+1):
+        active = np.flatnonzero(~converged)
+        sub_args = tuple(_take(arg, active) for arg in args)
+        sol = integrate_batch(f, f_jac, a, b, ya[active], slope[active], sub_args, rtol=rtol, atol=atol)
+        y_b, s_b = sol.y[0, :, -1], sol.y[2, :, -1]
+        residual[active] = y_b - yb[active]
+        done = np.abs(residual[active]) < tol
+        converged[active[done]] = True
+        if converged.all():
+            break
+        # Newton update on the members that are not there yet
+        todo = active[~done]
+        if np.any(s_b[~done] == 0):
+            stuck = todo[s_b[~done] == 0]
+            raise ZeroDivisionError(f"y(b) does not depend on the slope (s(b) = 0) for members {stuck.tolist()}:"
+                                    " the boundary value problem has no unique solution near these guesses")
+        slope[todo] -= residual[todo] / s_b[~done]
+
+    return SimpleNamespace(slope=slope, residual=residual, converged=converged, niter=niter)
+
+
+# ==== Benchmark: parameter sweep of y'' = -k y, y(0)=0, y(pi/2)=1 ====
+
+if __name__ == "__main__":
+    import argparse
+    from scipy.optimize import root_scalar
+
+    parser = argparse.ArgumentParser(description="Batched Newton shooting vs one bisection per BVP")
+    parser.add_argument("-n", type=int, default=1000, help="number of BVPs in the sweep")
+    parser.add_argument("-nloop", type=int, default=20, help="number of BVPs for the bisection reference")
+    args = parser.parse_args()
+
+    a, b = 0, np.pi/2
+    k = np.linspace(0.5, 1.5, args.n)
+    exact = np.sqrt(k) / np.sin(np.sqrt(k)*b)  # y = sin(sqrt(k) x)/sin(sqrt(k) pi/2)
+
+    f = lambda x, y, dy, k: -k*y
+    jac = lambda x, y, dy, k: (-k, 0.0)
+
+    t0 = time.perf_counter()
+    sol = shoot(f, jac, a, b, 0, 1, guesses=np.ones(args.n), args=(k,))
+    t_batch = time.perf_counter() - t0
+    print(f"batched Newton: {args.n} BVPs in {t_batch:.3f} s, {sol.niter} batched integrations,"
+          f" all converged: {sol.converged.all()}, max slope error {np.max(np.abs(sol.slope - exact)):.2e}")
+
+    # the demo2_solve_bvp.py approach: bisection with one solve_ivp per iterate, one BVP at a time
+    t0 = time.perf_counter()
+    for kk in k[:args.nloop]:
+        def residual(guess):
+            s = solve_ivp(lambda x, Y: [Y[1], -kk*Y[0]], [a, b], [0, guess], t_eval=[b], rtol=1e-8, atol=1e-10)
+            return s.y[0, -1] - 1
+        root = root_scalar(residual, bracket=[0, 5], method='bisect')
+    t_loop = (time.perf_counter() - t0)/args.nloop
+    print(f"bisection loop: {t_loop*1e3:.1f} ms per BVP ({root.function_calls} integrations each),"
+          f" projected {t_loop*args.n:.1f} s for {args.n} BVPs, speedup {t_loop*args.n/t_batch:.0f}x")
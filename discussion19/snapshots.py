@@ -0,0 +1,148 @@
+'''
+Headless snapshot writer and offline animation renderer for the PDE demos.
+
+Calling plt.plot/imshow, plt.pause and plt.clf every time step costs far more than
+the time step itself. Instead the solver hands each step to a SnapshotWriter, which
+keeps every stride-th frame in a preallocated, memory-mapped .npy cube
+(shape (n_frames, *field_shape)) plus a small <name>_times.npy with the frame times.
+Frames go straight to the page cache, so the solver never waits for a GUI.
+The animation is made afterwards from the cube:
+
+    python snapshots.py rod.npy -outfile rod.gif
+
+Example:
+    writer = SnapshotWriter('rod.npy', temps.shape, n_steps, stride=10)
+    for step in range(n_steps):
+        ...  # advance temps to time t
+        writer.write(step, t, temps)
+    writer.close()
+'''
+import os
+import numpy as np
+
+
+def times_path(path):
+    # the frame times live next to the cube: rod.npy -> rod_times.npy
+    root, ext = os.path.splitext(path)
+    return root + '_times' + ext
+
+
+class SnapshotWriter:
+    """
+    Streams every stride-th frame of a simulation into a memory-mapped .npy cube.
+
+    Attributes:
+        path (str): output .npy file.
+        stride (int): keep frames whose step number is a multiple of stride.
+        n_written (int): number of frames stored so far.
+    """
+
+    def __init__(self, path, shape, n_steps, stride=1, dtype=np.float32, resume=False):
+        """
+        Args:
+            path (str): output .npy file, overwritten if it exists (unless resume is set).
+            shape (tuple): shape of one frame, e.g. (nx,) or (ny, nx).
+            n_steps (int): largest step number that will be passed to write().
+            stride (int): keep every stride-th step.
+            dtype: storage type of the cube; float32 halves the disk use of the float64 solver state.
+            resume (bool): reopen an existing cube of the same layout and keep its frames,
+                for a run restarted from a checkpoint (see checkpoint.py).
+        """
+        self.path = path
+        self.stride = stride
+        n_frames = n_steps//stride + 1
+        shape = (n_frames,) + tuple(shape)
+        if resume and os.path.exists(path) and os.path.exists(times_path(path)):
+            self.cube = np.load(path, mmap_mode='r+')
+            self.times = np.load(times_path(path), mmap_mode='r+')
+            if self.cube.shape != shape or self.cube.dtype != dtype:
+                raise ValueError(f"{path} has shape {self.cube.shape} and dtype {self.cube.dtype},"
+                                 f" expected {shape} and {np.dtype(dtype)}")
+            self.n_written = int(np.count_nonzero(np.isfinite(self.times)))
+            return
+        self.cube = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+        self.times = np.lib.format.open_memmap(times_path(path), mode='w+', dtype=np.float64, shape=(n_frames,))
+        self.times[:] = np.nan  # frames that never get written stay NaN
+        self.n_written = 0
+
+    def write(self, step, t, field):
+        if step % self.stride:
+            return False
+        i = step//self.stride
+        if i >= self.cube.shape[0]:
+            raise IndexError(f"step {step} is beyond the {self.cube.shape[0]} frames allocated in {self.path}")
+        self.cube[i] = field
+        self.times[i] = t
+        self.n_written = max(self.n_written, i+1)
+        return True
+
+    def close(self):
+        self.cube.flush()
+        self.times.flush()
+        del self.cube, self.times
+
+
+def load_snapshots(path):
+    """
+    Opens a snapshot cube read-only (memory-mapped) and drops frames that were never written.
+
+    Returns:
+        tuple: cube of shape (n_frames, *field_shape) and the frame times.
+    """
+    cube = np.load(path, mmap_mode='r')
+    times = np.load(times_path(path))
+    n = np.count_nonzero(np.isfinite(times))
+    return cube[:n], times[:n]
+
+
+def render(path, outfile, fps=30, every=1, vmin=None, vmax=None, x=None):
+    """
+    Turns a snapshot cube into an animation file (.gif with pillow, anything else with ffmpeg).
+    1D frames are drawn as a line plot, 2D frames with imshow.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+
+    cube, times = load_snapshots(path)
+    cube, times = cube[::every], times[::every]
+    vmin = float(np.min(cube)) if vmin is None else vmin
+    vmax = float(np.max(cube)) if vmax is None else vmax
+
+    fig, ax = plt.subplots()
+    if cube.ndim == 2:
+        x = np.arange(cube.shape[1]) if x is None else x
+        artist, = ax.plot(x, cube[0])
+        ax.set_ylim(vmin, vmax)
+        update_artist = artist.set_ydata
+    else:
+        artist = ax.imshow(cube[0], origin='lower', vmin=vmin, vmax=vmax)
+        fig.colorbar(artist, ax=ax)
+        update_artist = artist.set_data
+    title = ax.set_title('')
+
+    def update(frame):
+        update_artist(cube[frame])
+        title.set_text('Time = ' + str(np.round(times[frame], 3)))
+        return artist, title
+
+    anim = FuncAnimation(fig, update, frames=len(cube), interval=1000/fps, blit=True)
+    anim.save(outfile, writer='pillow' if outfile.endswith('.gif') else 'ffmpeg', fps=fps)
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render a snapshot cube written by SnapshotWriter")
+    parser.add_argument("cube", type=str, help="snapshot .npy file")
+    parser.add_argument("-outfile", type=str, default="animation.gif", help="output animation (.gif or .mp4)")
+    parser.add_argument("-fps", type=int, default=30, help="frames per second")
+    parser.add_argument("-every", type=int, default=1, help="only render every n-th stored frame")
+    parser.add_argument("-vmin", type=float, default=None, help="lower color/y limit")
+    parser.add_argument("-vmax", type=float, default=None, help="upper color/y limit")
+    args = parser.parse_args()
+
+    render(args.cube, args.outfile, fps=args.fps, every=args.every, vmin=args.vmin, vmax=args.vmax)
+    print(f"Animation saved as {args.outfile}")
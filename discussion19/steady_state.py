@@ -0,0 +1,214 @@
+'''
+Direct steady-state solve for the diffusion demos.
+
+When only the final (equilibrium) temperature is needed, time-marching until the
+change per step is small is the slowest way to get there: the smooth error modes
+decay like exp(-d pi^2 t / L^2), so the 'Delta' printed by demo5_2d_diffusion.py
+shrinks more and more slowly. At equilibrium dT/dt = 0, i.e. the Laplace equation
+
+    laplace T = 0,   T fixed on the boundary
+
+which can be solved directly, either with a sparse direct solver or with
+multigrid V-cycles. Multigrid smooths the error on the fine grid (weighted Jacobi),
+moves the remaining smooth error to a grid with half the points, and repeats, so
+every error scale is handled on a grid where it is rough. Each V-cycle costs O(N)
+and reduces the residual by a roughly constant factor independent of the grid size.
+
+As in the demos, the values on the edges of the input array are the fixed temperatures.
+
+Example:
+    T_eq, info = solve_steady_state(temps, method='multigrid', tol=1e-10)
+    print(info['cycles'], 'V-cycles')
+'''
+import time
+import numpy as np
+import scipy.sparse as sparse
+from scipy.sparse.linalg import splu, spsolve
+
+
+# ==== Discrete Laplace problem on the interior ====
+
+def _minus_laplacian_1d(m):
+    return sparse.diags([-np.ones(m-1), 2*np.ones(m), -np.ones(m-1)], [-1, 0, 1], format='csr')
+
+def _kron_sum(mats):
+    # sum over axes of I x ... x L_axis x ... x I (C order: last axis fastest)
+    A = None
+    for axis, L in enumerate(mats):
+        term = sparse.identity(1, format='csr')
+        for other, M in enumerate(mats):
+            term = sparse.kron(term, L if other == axis else sparse.identity(M.shape[0]), format='csr')
+        A = term if A is None else A + term
+    return A.tocsr()
+
+def laplace_system(temps):
+    """
+    Builds -laplace (times h^2) on the interior of temps and the right-hand side from the fixed edges.
+
+    Returns:
+        tuple: sparse matrix A, right-hand side b (flattened interior), interior shape.
+    """
+    T = np.asarray(temps, dtype=float)
+    shape = tuple(n-2 for n in T.shape)
+    A = _kron_sum([_minus_laplacian_1d(m) for m in shape])
+    b = np.zeros(shape)
+    inner = (slice(1, -1),)*T.ndim
+    for axis in range(T.ndim):
+        for edge, target in ((0, 0), (-1, -1)):
+            src = list(inner)
+            src[axis] = edge
+            dst = [slice(None)]*T.ndim
+            dst[axis] = target
+            b[tuple(dst)] += T[tuple(src)]
+    return A, b.ravel(), shape
+
+
+# ==== Multigrid ====
+
+def _interpolation_1d(m):
+    # linear interpolation from m//2 coarse points (at fine points 1, 3, 5, ...) to m fine points;
+    # the fixed boundary contributes zero to the error
+    mc = m//2
+    rows, cols, vals = [], [], []
+    for j in range(mc):
+        i = 2*j + 1
+        rows += [i-1, i]
+        cols += [j, j]
+        vals += [0.5, 1.0]
+        if i+1 < m:
+            rows.append(i+1)
+            cols.append(j)
+            vals.append(0.5)
+    return sparse.csr_matrix((vals, (rows, cols)), shape=(m, mc))
+
+
+class Multigrid:
+    """
+    V-cycle multigrid for A x = b on a regular 1D/2D/3D grid.
+
+    Coarse grids keep every other point along each axis, the prolongation is (tensor-product)
+    linear interpolation P, restriction is P^T, and the coarse operators are P^T A P.
+    The coarsest grid (at most `coarsest` unknowns) is solved with a sparse LU.
+    """
+
+    def __init__(self, A, shape, coarsest=64, nu=2, omega=None):
+        self.nu = nu
+        self.omega = (2/3 if len(shape) == 1 else 0.8) if omega is None else omega
+        self.levels = []
+        while True:
+            level = {'A': A, 'Dinv': 1/A.diagonal()}
+            self.levels.append(level)
+            if np.prod(shape) <= coarsest or min(shape) < 3:
+                level['lu'] = splu(A.tocsc())
+                break
+            P = _interpolation_1d(shape[0])
+            for m in shape[1:]:
+                P = sparse.kron(P, _interpolation_1d(m), format='csr')
+            level['P'], level['R'] = P, P.T.tocsr()
+            A = (level['R'] @ A @ P).tocsr()
+            shape = tuple(m//2 for m in shape)
+
+    def _smooth(self, level, x, b):
+        A, Dinv = level['A'], level['Dinv']
+        for _ in range(self.nu):
+            x += self.omega*Dinv*(b - A @ x)
+
+    def v_cycle(self, x, b, k=0):
+        level = self.levels[k]
+        if 'lu' in level:
+            return level['lu'].solve(b)
+        self._smooth(level, x, b)
+        r = b - level['A'] @ x
+        rc = level['R'] @ r
+        x += level['P'] @ self.v_cycle(np.zeros_like(rc), rc, k+1)
+        self._smooth(level, x, b)
+        return x
+
+    def solve(self, b, x0=None, tol=1e-10, max_cycles=100):
+        """
+        Runs V-cycles until ||b - A x|| <= tol ||b||.
+
+        Returns:
+            tuple: solution and the list of relative residuals after each cycle.
+        """
+        A = self.levels[0]['A']
+        x = np.zeros_like(b) if x0 is None else np.array(x0, dtype=float)
+        bnorm = np.linalg.norm(b) or 1.0
+        history = []
+        for _ in range(max_cycles):
+            x = self.v_cycle(x, b)
+            history.append(np.linalg.norm(b - A @ x)/bnorm)
+            if history[-1] <= tol:
+                break
+        return x, history
+
+
+def solve_steady_state(temps, method='multigrid', tol=1e-10, max_cycles=100):
+    """
+    Equilibrium temperatures for the given fixed edges (the interior of temps is only a starting guess).
+
+    Args:
+        temps (ndarray): 1D, 2D or 3D temperature grid; the edge values are held fixed.
+        method (str): 'multigrid' or 'direct' (sparse LU).
+        tol (float): relative residual for multigrid.
+
+    Returns:
+        tuple: equilibrium temperatures (same shape as temps) and an info dict with
+            'cycles', 'residuals' and 'time'.
+    """
+    t0 = time.perf_counter()
+    T = np.array(temps, dtype=float)
+    A, b, shape = laplace_system(T)
+    inner = (slice(1, -1),)*T.ndim
+    if method == 'direct':
+        x = spsolve(A.tocsc(), b)
+        history = [np.linalg.norm(b - A @ x)/(np.linalg.norm(b) or 1.0)]
+        cycles = 0
+    elif method == 'multigrid':
+        x, history = Multigrid(A, shape).solve(b, x0=T[inner].ravel(), tol=tol, max_cycles=max_cycles)
+        cycles = len(history)
+    else:
+        raise ValueError(f"Unknown method {method!r}, choose 'multigrid' or 'direct'")
+    T[inner] = x.reshape(shape)
+    return T, {'cycles': cycles, 'residuals': history, 'time': time.perf_counter() - t0}
+
+
+# ==== Benchmark: time to tolerance against explicit time-marching ====
+
+if __name__ == "__main__":
+    import argparse
+    from diffusion_kernels import update_temps
+
+    parser = argparse.ArgumentParser(description="Steady-state solve vs explicit time-marching")
+    parser.add_argument("-sizes", type=int, nargs="+", default=[20, 64, 128, 256], help="plate sizes nx")
+    parser.add_argument("-tol", type=float, default=1e-3, help="max |T - T_eq| in K for the explicit run")
+    parser.add_argument("-max_explicit", type=int, default=2*10**6, help="give up time-marching after this many steps")
+    args = parser.parse_args()
+
+    for nx in args.sizes:
+        temps = 273*np.ones((nx, nx))
+        temps[:, -1] = 77.
+
+        T_direct, info_d = solve_steady_state(temps, method='direct')
+        T_mg, info_mg = solve_steady_state(temps, method='multigrid', tol=1e-10)
+
+        # demo5 approach: march with the largest stable explicit step until within tol of equilibrium
+        coef = 0.24
+        T, newT = temps.copy(), temps.copy()
+        update_temps(T, newT, coef)  # compile outside the timing
+        T, newT = temps.copy(), temps.copy()
+        t0 = time.perf_counter()
+        n = 0
+        while n < args.max_explicit:
+            for _ in range(100):
+                update_temps(T, newT, coef)
+                T, newT = newT, T
+            n += 100
+            if np.max(np.abs(T - T_direct)) < args.tol:
+                break
+        t_explicit = time.perf_counter() - t0
+
+        print(f"{nx}x{nx}: explicit {n} steps {t_explicit:.3f} s (to {args.tol:g} K) |"
+              f" multigrid {info_mg['cycles']} V-cycles {info_mg['time']:.4f} s"
+              f" (residual {info_mg['residuals'][-1]:.1e}, max |T_mg - T_direct| = {np.max(np.abs(T_mg - T_direct)):.1e} K) |"
+              f" direct {info_d['time']:.4f} s")